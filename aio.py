@@ -0,0 +1,98 @@
+import importlib.util
+from sqlalchemy.engine import make_url
+try:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+except ImportError:
+    create_async_engine = None
+
+#----------------------------------------------------------------------------#
+# Async reads.
+#
+# Under asgi.py the detail views read through an async engine (asyncpg on
+# Postgres, aiosqlite on SQLite). Every read checks out its own connection,
+# so the independent statements of one page can be awaited together with
+# asyncio.gather instead of running back to back. The engine is only built
+# when SQLAlchemy's asyncio support (greenlet) and the driver are installed
+# (requirements-async.txt); otherwise available is False and every route
+# stays synchronous.
+#----------------------------------------------------------------------------#
+
+ASYNC_DRIVERS = {
+    'postgresql': ('postgresql+asyncpg', 'asyncpg'),
+    'sqlite': ('sqlite+aiosqlite', 'aiosqlite'),
+}
+
+
+def async_url(url):
+    """url with its backend's async driver, or None if that driver is not installed."""
+    url = make_url(url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if create_async_engine is None or driver is None or importlib.util.find_spec(driver[1]) is None:
+        return None
+    # an in-memory SQLite database is private to its connection
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return None
+    return url.set(drivername=driver[0])
+
+
+class AsyncReads(object):
+
+    def __init__(self, url, on_engine=None, **engine_options):
+        self.url = async_url(url) if url else None
+        # called with the sync Engine behind the async one once it exists, for event listeners
+        self.on_engine = on_engine
+        self.engine_options = engine_options
+        self._engine = None
+        self._sessions = None
+
+    @classmethod
+    def from_config(cls, config, on_engine=None):
+        options = {'pool_pre_ping': config['SQLALCHEMY_ENGINE_OPTIONS'].get('pool_pre_ping', False)}
+        if not config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+            options.update(pool_size=config.get('ASYNC_DB_POOL_SIZE', 5),
+                           max_overflow=config.get('ASYNC_DB_MAX_OVERFLOW', 5))
+        return cls(config.get('ASYNC_DATABASE_URL') or config['SQLALCHEMY_DATABASE_URI'], on_engine, **options)
+
+    @property
+    def available(self):
+        return self.url is not None
+
+    @property
+    def engine(self):
+        # created on first use, inside the event loop that will run the reads
+        if self._engine is None:
+            self._engine = create_async_engine(self.url, **self.engine_options)
+            if self.on_engine:
+                self.on_engine(self._engine.sync_engine)
+        return self._engine
+
+    @property
+    def sessions(self):
+        if self._sessions is None:
+            self._sessions = async_sessionmaker(self.engine, expire_on_commit=False)
+        return self._sessions
+
+    async def first(self, statement):
+        """First row of a Core statement, or None."""
+        async with self.engine.connect() as connection:
+            return (await connection.execute(statement)).first()
+
+    async def all(self, statement):
+        """Every row of a Core statement."""
+        async with self.engine.connect() as connection:
+            return (await connection.execute(statement)).all()
+
+    async def scalar(self, statement):
+        """First ORM entity (or value) of a statement, or None; loaded objects come back detached."""
+        async with self.sessions() as session:
+            return (await session.execute(statement)).scalars().first()
+
+    async def scalars(self, statement):
+        """All ORM entities (or values) of a statement; loaded objects come back detached."""
+        async with self.sessions() as session:
+            return (await session.execute(statement)).scalars().all()
+
+    async def dispose(self):
+        if self._engine is not None:
+            await self._engine.dispose()
+            self._engine = self._sessions = None
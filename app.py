@@ -2,20 +2,39 @@
 # Imports
 #----------------------------------------------------------------------------#
 
+import asyncio
+import bisect
 import json
-import sys
 import dateutil.parser
 import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
+import babel.dates
+import functools
+from flask import Flask, Blueprint, render_template, request, Response, flash, redirect, url_for, jsonify, stream_with_context, abort
 from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects.postgresql import ARRAY, ExcludeConstraint
 from flask_migrate import Migrate
-import logging
-from logging import Formatter, FileHandler
+import click
 from flask_wtf import Form
 from forms import *
-from datetime import datetime
-import operator
+from datetime import datetime, date, time, timedelta
+import calendar
+from collections import Counter
+try:
+  import orjson
+except ImportError:
+  orjson = None
+import search
+from pagination import keyset_page, page_size
+from cache import ResponseCache, backend_from_config
+from pool_metrics import PoolMetrics
+from profiler import QueryProfiler
+from logs import configure_logging
+import importer
+import exporter
+import conditional
+import fragments
+import aio
 
 #----------------------------------------------------------------------------#
 # App Config.
@@ -28,6 +47,14 @@ moment = Moment(app)
 app.config.from_object('config')
 db = SQLAlchemy(app)
 migrate = Migrate(app, db)
+pool_metrics = PoolMetrics()
+query_profiler = QueryProfiler.from_config(app.config)
+with app.app_context():
+  pool_metrics.install(db.engine)
+  query_profiler.install(app, db.engine)
+response_cache = ResponseCache(backend_from_config(app.config), app.config['CACHE_DEFAULT_TIMEOUT'])
+# async engine for the async views served by asgi.py
+async_reads = aio.AsyncReads.from_config(app.config, on_engine=query_profiler.watch)
 
 #----------------------------------------------------------------------------#
 # Models.
@@ -45,7 +72,21 @@ class Show(db.Model):
   venue_name = db.Column(db.String, nullable=False)
   artist_name = db.Column(db.String, nullable=False)
   artist_image_link = db.Column(db.String(500))
-  start_time = db.Column(db.DateTime)
+  start_time = db.Column(db.DateTime, index=True)
+  end_time = db.Column(db.DateTime)
+  updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now,
+                         server_default=db.func.now())
+
+  __table_args__ = (
+    db.Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time'),
+    db.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time'),
+    # a venue (or an artist) cannot have two overlapping shows; elsewhere
+    # show_conflicts() is the only check
+    ExcludeConstraint(('venue_id', '='), (db.func.tsrange(start_time, end_time), '&&'),
+                      name='ex_shows_venue_overlap', using='gist').ddl_if(dialect='postgresql'),
+    ExcludeConstraint(('artist_id', '='), (db.func.tsrange(start_time, end_time), '&&'),
+                      name='ex_shows_artist_overlap', using='gist').ddl_if(dialect='postgresql'),
+  )
 
   def __repr__(self):
       return f'<Show: {self.id}, Venue: ({self.venue_id}, {self.venue_name}), Artist: ({self.artist_id}, {self.artist_name})>'
@@ -63,11 +104,25 @@ class Venue(db.Model):
     facebook_link = db.Column(db.String(120))
 
     # TODO: implement any missing fields, as a database migration using Flask-Migrate
-    genres = db.Column(db.ARRAY(db.String(50)), default=dict)
+    # a JSON list on SQLite, where genre_filter() matches it with json_each()
+    genres = db.Column(ARRAY(db.String(50)).with_variant(db.JSON(), 'sqlite'), default=dict)
     website = db.Column(db.String(200))
     seeking_talent = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
-    artists = db.relationship('Show', back_populates="venue")
+    artists = db.relationship('Show', back_populates="venue", order_by='Show.start_time')
+
+    # show counters, maintained by refresh_show_counters()
+    show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    upcoming_show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_show_time = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now,
+                           server_default=db.func.now())
+
+    __table_args__ = (
+      db.Index('ix_venues_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+      db.Index('ix_venues_genres', 'genres', postgresql_using='gin'),
+      db.Index('ix_venues_state_city_name', 'state', 'city', 'name'),
+    )
 
     def __repr__(self):
       return f'<Venue: {self.id}, {self.name}, {self.city}>'
@@ -81,13 +136,26 @@ class Artist(db.Model):
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120), nullable=False)
-    genres = db.Column(db.ARRAY(db.String(50)), default=dict)
+    genres = db.Column(ARRAY(db.String(50)).with_variant(db.JSON(), 'sqlite'), default=dict)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website = db.Column(db.String(200))
     seeking_venue = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
-    venues = db.relationship('Show', back_populates="artist")
+    venues = db.relationship('Show', back_populates="artist", order_by='Show.start_time')
+
+    # show counters, maintained by refresh_show_counters()
+    show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    upcoming_show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_show_time = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now,
+                           server_default=db.func.now())
+
+    __table_args__ = (
+      db.Index('ix_artists_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+      db.Index('ix_artists_genres', 'genres', postgresql_using='gin'),
+      db.Index('ix_artists_state_city_name', 'state', 'city', 'name'),
+    )
 
     def __repr__(self):
       return f'<Artist: {self.id}, {self.name}>'
@@ -97,77 +165,488 @@ class Artist(db.Model):
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format)
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma",
+}
+
+@functools.lru_cache(maxsize=None)
+def datetime_pattern(format, locale):
+  # Babel pattern and locale objects, parsed once per (format, locale)
+  return babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format)), babel.Locale.parse(locale)
+
+@functools.lru_cache(maxsize=4096)
+def format_datetime(value, format='medium', locale=babel.dates.LC_TIME):
+  # value is a datetime, or a string dateutil can parse; listings repeat the
+  # same start times, so formatted output is memoized
+  date = dateutil.parser.parse(value) if isinstance(value, str) else value
+  pattern, locale = datetime_pattern(format, locale)
+  return pattern.apply(date, locale)
 
 app.jinja_env.filters['datetime'] = format_datetime
 
-####### VENUES #######
+fragment_cache = fragments.FragmentCache(
+  backend_from_config(dict(app.config, CACHE_MAX_ENTRIES=app.config['FRAGMENT_CACHE_MAX_ENTRIES'])),
+  response_cache, ('venues', 'artists', 'shows'), app.config['FRAGMENT_CACHE_TIMEOUT'])
+fragments.install(app, fragment_cache, app.config['JINJA_BYTECODE_CACHE'], app.config['JINJA_BYTECODE_CACHE_DIR'])
 
-def show_count_per_venue(venue_id, upcoming=True):
-  try:
-    if upcoming:
-      comp = operator.ge
+#----------------------------------------------------------------------------#
+# Pagination.
+#----------------------------------------------------------------------------#
+
+def page_args():
+  # keyset cursor and page size from the query string
+  return {
+    'after': request.args.get('after'),
+    'before': request.args.get('before'),
+    'limit': page_size(request.args.get('limit'), app.config['PAGE_SIZE'], app.config['MAX_PAGE_SIZE']),
+  }
+
+def page_url(**cursor):
+  # current url with its filters kept and the cursor replaced
+  args = {k: v for k, v in request.args.lists() if k not in ('after', 'before')}
+  args.update(cursor)
+  return url_for(request.endpoint, **request.view_args, **args)
+
+app.jinja_env.globals['page_url'] = page_url
+
+####### SEARCH #######
+
+name_searches = {}
+
+def name_search(model):
+  # per-model search backend, chosen once from SEARCH_BACKEND and the db dialect
+  backend = name_searches.get(model)
+  if backend is None:
+    cls = search.backend_for(app.config.get('SEARCH_BACKEND', 'auto'), db.engine.dialect.name)
+    backend = name_searches[model] = cls(db.session, model)
+  return backend
+
+####### GENRES #######
+
+def genre_args(args=None):
+  # ?genre=Jazz&genre=Folk&match=any|all (any by default)
+  args = request.args if args is None else args
+  return [g for g in args.getlist('genre') if g], ('all' if args.get('match') == 'all' else 'any')
+
+def genre_filter(model, genres, match='any'):
+  # overlap (&&) and contains (@>) are both answered by the GIN index on
+  # genres. Elsewhere genres is a JSON list, matched through json_each()
+  if not genres:
+    return db.true()
+  if db.engine.dialect.name == 'postgresql':
+    return model.genres.contains(genres) if match == 'all' else model.genres.overlap(genres)
+  each = db.func.json_each(model.genres).table_valued('value')
+  matched = db.select(db.func.count(db.distinct(each.c.value))).where(each.c.value.in_(genres)).scalar_subquery()
+  return matched == len(set(genres)) if match == 'all' else matched > 0
+
+def genre_search(model, matches, genres, match):
+  # narrow name search results (id, name) to the requested genres, keeping their order
+  if not genres or not matches:
+    return matches
+  ids = {id for id, in db.session.query(model.id).filter(model.id.in_([id for id, _ in matches]),
+                                                          genre_filter(model, genres, match))}
+  return [m for m in matches if m[0] in ids]
+
+def genre_facets(model, state=None, city=None):
+  # [(genre, count)] over all venues/artists (or those in an area), most
+  # common first; computed once per generation of the model's cache namespace
+  def count_genres():
+    if db.engine.dialect.name == 'postgresql':
+      genres = db.select(db.func.unnest(model.genres).label('genre')).where(area_filter(model, state, city)).subquery()
+      rows = db.session.execute(db.select(genres.c.genre, db.func.count()).group_by(genres.c.genre)).all()
     else:
-      comp = operator.lt
-    return  db.session.query(db.func.count(Show.start_time))\
-                .filter(Venue.id == venue_id, Venue.id == Show.venue_id, comp(Show.start_time, datetime.now()))\
-                .first()[0]
-  except:
-    print(sys.exc_info())
+      query = db.session.query(model.genres).filter(area_filter(model, state, city))
+      rows = Counter(g for r in query for g in (r.genres or [])).items()
+    return sorted(((genre, count) for genre, count in rows), key=lambda r: (-r[1], r[0]))
+  key = 'genres:{}:{}:{}'.format(model.__tablename__, state or '', city or '')
+  return response_cache.memoize(key, (model.__tablename__,), count_genres)
+
+####### AREAS #######
+
+def area_args(args=None):
+  # ?state=CA&city=San Francisco; either may be left out
+  args = request.args if args is None else args
+  return args.get('state') or None, args.get('city') or None
+
+def area_filter(model, state=None, city=None):
+  # equality on the leading columns of ix_<table>_state_city_name
+  conditions = []
+  if state:
+    conditions.append(model.state == state)
+  if city:
+    conditions.append(model.city == city)
+  return db.and_(db.true(), *conditions)
+
+def area_facets(state=None):
+  # [{state, city, venues, artists, upcoming_shows, next_show_time}] for
+  # every area, from one grouped query over venues and artists; upcoming
+  # shows come from the venues' counters
+  counters = current_counters(Venue)
+  venues = db.select(Venue.state, Venue.city, db.literal(1).label('venues'), db.literal(0).label('artists'),
+                     counters['upcoming_show_count'].label('upcoming_shows'),
+                     counters['next_show_time'].label('next_show_time'))\
+             .where(area_filter(Venue, state))
+  artists = db.select(Artist.state, Artist.city, db.literal(0), db.literal(1), db.literal(0),
+                      db.null().label('next_show_time'))\
+              .where(area_filter(Artist, state), Artist.state.isnot(None), Artist.city.isnot(None))
+  rows = db.union_all(venues, artists).subquery()
+  query = db.select(rows.c.state, rows.c.city, db.func.sum(rows.c.venues).label('venues'),
+                    db.func.sum(rows.c.artists).label('artists'),
+                    db.func.sum(rows.c.upcoming_shows).label('upcoming_shows'),
+                    db.func.min(rows.c.next_show_time).label('next_show_time'))\
+            .group_by(rows.c.state, rows.c.city)\
+            .order_by(rows.c.state, rows.c.city)
+  return [r._asdict() for r in db.session.execute(query)]
+
+####### SHOWS #######
+
+def show_counts(key, ids):
+  # upcoming and past show counts for every id in one aggregate query,
+  # returned as {id: {"upcoming": n, "past": m, "next_show_time": t}};
+  # next_show_time is when the next upcoming show turns into a past one
+  ids = list(ids)
+  counts = {i: {"upcoming": 0, "past": 0, "next_show_time": None} for i in ids}
+  if not ids:
+    return counts
+  now = datetime.now()
+  rows = db.session.query(key,
+              db.func.count(db.case((Show.start_time >= now, Show.id))).label("upcoming"),
+              db.func.count(db.case((Show.start_time < now, Show.id))).label("past"),
+              db.func.min(db.case((Show.start_time >= now, Show.start_time))).label("next_show_time"))\
+              .filter(key.in_(ids))\
+              .group_by(key)\
+              .all()
+  for r in rows:
+    counts[r[0]] = {"upcoming": r.upcoming, "past": r.past, "next_show_time": r.next_show_time}
+  return counts
+
+def show_counter_values(model, key, now):
+  # correlated subqueries computing a venue's/artist's show counters from shows
+  return {
+    'show_count': db.select(db.func.count(Show.id)).where(key == model.id).scalar_subquery(),
+    'upcoming_show_count': db.select(db.func.count(Show.id))\
+        .where(key == model.id, Show.start_time >= now).scalar_subquery(),
+    'next_show_time': db.select(db.func.min(Show.start_time))\
+        .where(key == model.id, Show.start_time >= now).scalar_subquery(),
+  }
+
+def show_counter_key(model):
+  return Show.venue_id if model is Venue else Show.artist_id
+
+def refresh_show_counters(model, ids=None):
+  # recompute the stored counters of the given venues/artists (all when ids
+  # is None) with one set-based UPDATE in the current transaction
+  if ids is not None:
+    ids = [i for i in set(ids) if i is not None]
+    if not ids:
+      return
+  stmt = db.update(model).values(**show_counter_values(model, show_counter_key(model), datetime.now()))
+  if ids is not None:
+    stmt = stmt.where(model.id.in_(ids))
+  db.session.execute(stmt.execution_options(synchronize_session=False))
+
+def show_counter_drift(model):
+  # number of rows whose stored counters disagree with the shows table
+  values = show_counter_values(model, show_counter_key(model), datetime.now())
+  return db.session.query(db.func.count(model.id))\
+              .filter(db.or_(*[getattr(model, name).is_distinct_from(value) for name, value in values.items()]))\
+              .scalar()
+
+def current_counters(model):
+  # upcoming_show_count and next_show_time as of now, for a SELECT: the
+  # stored counters, recounted from shows only for rows whose next show has
+  # started since they were written. Nothing is written back; flask
+  # reconcile-counters does that
+  now = datetime.now()
+  stale = model.next_show_time < now
+  values = show_counter_values(model, show_counter_key(model), now)
+  return {name: db.case((stale, values[name]), else_=getattr(model, name))
+          for name in ('upcoming_show_count', 'next_show_time')}
+
+# shows keep copies of these venue/artist columns: {model: {source: copy}}
+SHOW_NAME_COPIES = {
+  'venues': {'name': 'venue_name'},
+  'artists': {'name': 'artist_name', 'image_link': 'artist_image_link'},
+}
+
+def show_name_values(model):
+  # correlated subqueries reading the copied columns of a show from its venue/artist
+  key = show_counter_key(model)
+  return {copy: db.select(getattr(model, source)).where(model.id == key).scalar_subquery()
+          for source, copy in SHOW_NAME_COPIES[model.__tablename__].items()}
+
+def show_name_drift(model, lo=None, hi=None):
+  # condition matching shows (optionally with lo <= id < hi) whose copies disagree with the source row
+  condition = db.or_(*[getattr(Show, copy).is_distinct_from(value) for copy, value in show_name_values(model).items()])
+  condition = db.and_(show_counter_key(model).isnot(None), condition)
+  if lo is not None:
+    condition = db.and_(condition, Show.id >= lo, Show.id < hi)
+  return condition
+
+@db.event.listens_for(db.session, 'after_flush')
+def propagate_show_names(session, flush_context):
+  # a renamed venue/artist (or new artist image) rewrites the copies on its
+  # shows with one UPDATE per changed row, in the same transaction
+  shows = Show.__table__
+  for obj in session.dirty:
+    copies = SHOW_NAME_COPIES.get(getattr(obj, '__tablename__', None))
+    if not copies:
+      continue
+    state = db.inspect(obj)
+    changed = {copy: getattr(obj, source) for source, copy in copies.items()
+               if state.attrs[source].history.has_changes()}
+    if not changed:
+      continue
+    key = shows.c.venue_id if isinstance(obj, Venue) else shows.c.artist_id
+    session.connection().execute(
+      shows.update().values(**changed)
+           .where(key == obj.id, db.or_(*[shows.c[copy].is_distinct_from(v) for copy, v in changed.items()])))
+
+####### CALENDAR #######
+
+def parse_time(value):
+  # ISO 8601 (or anything dateutil reads) as a naive local datetime, None if empty
+  if not value:
+    return None
+  parsed = dateutil.parser.parse(value)
+  if parsed.tzinfo is not None:
+    parsed = parsed.astimezone().replace(tzinfo=None)
+  return parsed
+
+def window_args(args=None):
+  # time window ?from=&to= plus venue_id/artist_id/state/city filters;
+  # raises ValueError for unreadable times
+  args = request.args if args is None else args
+  return {
+    'start': parse_time(args.get('from')),
+    'end': parse_time(args.get('to')),
+    'venue_id': args.get('venue_id', type=int),
+    'artist_id': args.get('artist_id', type=int),
+    'state': args.get('state') or None,
+    'city': args.get('city') or None,
+  }
+
+def window_filter(start=None, end=None, venue_id=None, artist_id=None, state=None, city=None):
+  # shows starting in [start, end); a range scan on ix_shows_venue_id_start_time
+  # or ix_shows_artist_id_start_time when filtered by venue/artist, on the
+  # start_time index otherwise
+  conditions = [Show.start_time.isnot(None)]
+  if start is not None:
+    conditions.append(Show.start_time >= start)
+  if end is not None:
+    conditions.append(Show.start_time < end)
+  if venue_id is not None:
+    conditions.append(Show.venue_id == venue_id)
+  if artist_id is not None:
+    conditions.append(Show.artist_id == artist_id)
+  if state or city:
+    conditions.append(Show.venue_id.in_(db.select(Venue.id).where(area_filter(Venue, state, city))))
+  return db.and_(*conditions)
+
+def shows_per_day(**window):
+  # {date: number of shows} for a window, from one GROUP BY on the day of start_time
+  day = db.func.date(Show.start_time, type_=db.Date)
+  rows = db.session.query(day, db.func.count(Show.id)).filter(window_filter(**window)).group_by(day)
+  return {d: n for d, n in rows}
+
+def month_weeks(month=None):
+  # full weeks (Monday first) covering ?month=YYYY-MM, the current month by default
+  try:
+    year, number = (int(p) for p in month.split('-'))
+    # the grid and the previous/next month links reach into the years either side
+    if not date.min.year < year < date.max.year:
+      raise ValueError(month)
+    first = date(year, number, 1)
+  except (AttributeError, ValueError):
+    first = date.today().replace(day=1)
+  return first, calendar.Calendar().monthdatescalendar(first.year, first.month)
+
+####### SCHEDULING #######
+
+def show_end_time(start_time, end_time=None):
+  # end_time, or start_time plus the default duration; ValueError unless the
+  # show ends after it starts and within SHOW_MAX_DURATION_MINUTES
+  if end_time is None:
+    end_time = start_time + timedelta(minutes=app.config['SHOW_DEFAULT_DURATION_MINUTES'])
+  if end_time <= start_time:
+    raise ValueError('a show must end after it starts')
+  if end_time - start_time > timedelta(minutes=app.config['SHOW_MAX_DURATION_MINUTES']):
+    raise ValueError('a show can last at most {} minutes'.format(app.config['SHOW_MAX_DURATION_MINUTES']))
+  return end_time
+
+def show_conflicts(venue_id, artist_id, start_time, end_time):
+  # shows at the venue, or by the artist, overlapping [start_time, end_time).
+  # No show lasts longer than SHOW_MAX_DURATION_MINUTES, so only shows that
+  # start inside that much before end_time can overlap: a bounded range scan
+  # of the (venue_id, start_time) and (artist_id, start_time) indexes, however
+  # long the schedule grows
+  earliest = start_time - timedelta(minutes=app.config['SHOW_MAX_DURATION_MINUTES'])
+  return db.session.query(Show.id, Show.venue_id, Show.venue_name, Show.artist_id, Show.artist_name,
+                          Show.start_time, Show.end_time)\
+              .filter(db.or_(Show.venue_id == venue_id, Show.artist_id == artist_id),
+                      Show.start_time > earliest, Show.start_time < end_time, Show.end_time > start_time)\
+              .order_by(Show.start_time)\
+              .all()
+
+def conflict_message(show, venue_id):
+  who = show.venue_name if show.venue_id == venue_id else show.artist_name
+  return '{} is already booked from {} to {}'.format(who, show.start_time, show.end_time)
+
+####### DETAIL #######
+
+def entity_shows_query(model, id):
+  # a venue's/artist's dated shows in start order, with their venue's image for an artist
+  query = db.select(Show).where(show_counter_key(model) == id, Show.start_time.isnot(None)).order_by(Show.start_time)
+  if model is Artist:
+    query = query.options(db.joinedload(Show.venue).load_only(Venue.image_link))
+  return query
+
+def split_shows(shows, show_row):
+  # {"upcoming", "past", "next_show_time"} from shows in start order
+  now = datetime.now()
+  upcoming = [s for s in shows if s.start_time >= now]
+  return {
+    "upcoming": [show_row(s) for s in upcoming],
+    "past": [show_row(s) for s in shows if s.start_time < now],
+    "next_show_time": upcoming[0].start_time if upcoming else None,
+  }
+
+def entity_with_shows(model, id, show_row):
+  # a venue/artist and its shows in two statements: the entity row, then one
+  # selectin load of its dated shows (joined to their venue for an artist's
+  # venue images). Returns (entity, split_shows()) or (None, None) for an
+  # unknown id
+  if model is Venue:
+    loader = db.selectinload(Venue.artists.and_(Show.start_time.isnot(None)))
+  else:
+    loader = db.selectinload(Artist.venues.and_(Show.start_time.isnot(None)))\
+               .joinedload(Show.venue).load_only(Venue.image_link)
+  entity = db.session.query(model).options(loader).filter(model.id == id).first()
+  if entity is None:
+    return None, None
+  return entity, split_shows(entity.artists if model is Venue else entity.venues, show_row)
+
+def detail_data(model, entity, shows, fields=None):
+  # detail dict of the given columns (all by default) with the show lists and counts
+  data = {name: getattr(entity, name) for name in (fields or model.__table__.columns.keys())}
+  response_cache.expire_at(shows["next_show_time"])
+  data["upcoming_shows"] = shows["upcoming"]
+  data["past_shows"] = shows["past"]
+  data["upcoming_shows_count"] = len(shows["upcoming"])
+  data["past_shows_count"] = len(shows["past"])
+  return data
+
+def entity_show_rows_query(model, id):
+  # entity_shows_query() as plain rows of the columns the API lists for each show
+  if model is Venue:
+    query = db.select(Show.artist_id, Show.artist_name, Show.artist_image_link, Show.start_time)
+  else:
+    query = db.select(Show.venue_id, Show.venue_name, Venue.image_link.label('venue_image_link'), Show.start_time)\
+              .join(Venue, Venue.id == Show.venue_id)
+  return query.where(show_counter_key(model) == id, Show.start_time.isnot(None)).order_by(Show.start_time)
+
+def show_row_dict(row):
+  return row._asdict()
+
+def entity_detail(model, id, show_row, fields=None):
+  entity, shows = entity_with_shows(model, id, show_row)
+  if entity is None:
+    return None
+  return detail_data(model, entity, shows, fields)
+
+####### VALIDATORS #######
+
+def entity_validators_query(model, id):
+  # a venue/artist detail page's validators: its row, its shows, how many
+  # are still upcoming and the latest one to have started
+  now = datetime.now()
+  key = show_counter_key(model)
+  columns = [model.updated_at, db.func.count(Show.id), db.func.max(Show.updated_at),
+             db.func.count(db.case((Show.start_time >= now, Show.id))),
+             db.func.max(db.case((Show.start_time < now, Show.start_time)))]
+  query = db.select(*columns).select_from(model).outerjoin(Show, key == model.id)
+  if model is Artist:
+    # artist pages also show each venue's image
+    query = query.add_columns(db.func.max(Venue.updated_at)).outerjoin(Venue, Venue.id == Show.venue_id)
+  return query.where(model.id == id).group_by(model.id)
+
+def entity_validators_of(row):
+  # (values, last_modified) from an entity_validators_query() row; None if the id is unknown
+  if row is None:
+    return None
+  return tuple(row), conditional.latest(row[0], row[2], row[4], *row[5:])
+
+def entity_validators(model, id):
+  return entity_validators_of(db.session.execute(entity_validators_query(model, id)).first())
+
+def table_validators(model, *extra):
+  # (values, None) for a listing: row count, latest update and any
+  # listing-specific aggregates. No Last-Modified: deleting a row leaves
+  # max(updated_at) where it was, so only the ETag (which has the count) changes
+  row = db.session.query(db.func.count(model.id), db.func.max(model.updated_at), *extra).one()
+  return tuple(row), None
+
+def counter_listing_validators(model):
+  # for listings that serve current_counters(): every show that starts changes
+  # someone's upcoming count, and moves the latest start time that has passed
+  started = db.select(db.func.max(Show.start_time)).where(Show.start_time < datetime.now()).scalar_subquery()
+  return table_validators(model, started)
+
+def not_modified(validators):
+  if validators is None:
+    return None
+  values, last_modified = validators
+  return conditional.not_modified(*values, last_modified=last_modified)
+
+####### VENUES #######
+
+def show_counts_per_venue(venue_ids):
+  return show_counts(Show.venue_id, venue_ids)
 
-def show_list_per_venue(venue_id, upcoming=True):
+def show_count_per_venue(venue_id, upcoming=True):
   try:
-    if upcoming:
-      comp = operator.ge
-    else:
-      comp = operator.lt
-    shows = db.session.query(Show.artist_id, Show.artist_name, Show.artist_image_link, \
-                db.func.cast(Show.start_time, db.String).label("start_time"))\
-                .filter(Venue.id == venue_id, Venue.id == Show.venue_id, comp(Show.start_time, datetime.now()))\
-                .all()
-    shows = [s._asdict() for s in shows]
-    return shows
+    return show_counts_per_venue([venue_id])[venue_id]["upcoming" if upcoming else "past"]
   except:
-    print(sys.exc_info())
+    app.logger.exception('show_count_per_venue failed')
+
+def venues_with_upcoming_counts():
+  # every venue with its area, upcoming show count and next show time, read
+  # from the venue's own counters; shows are only counted for stale rows
+  counters = current_counters(Venue)
+  return db.session.query(Venue.city, Venue.state, Venue.id, Venue.name,
+                          counters['upcoming_show_count'].label("num_upcoming_shows"),
+                          counters['next_show_time'].label("next_show_time"))
+
+def group_venues_by_area(rows):
+  # single pass over (city, state, id, name, num_upcoming_shows) rows
+  areas = {}
+  for r in rows:
+    area = areas.get((r.city, r.state))
+    if area is None:
+      area = areas[(r.city, r.state)] = {'city': r.city, 'state': r.state, 'venues': []}
+    area['venues'].append({'id': r.id, 'name': r.name, 'num_upcoming_shows': r.num_upcoming_shows})
+  return list(areas.values())
+
+def venue_show_row(show):
+  return {"artist_id": show.artist_id, "artist_name": show.artist_name,
+          "artist_image_link": show.artist_image_link, "start_time": show.start_time}
 
 
 ####### ARTISTS #######
 
+def show_counts_per_artist(artist_ids):
+  return show_counts(Show.artist_id, artist_ids)
+
 def show_count_per_artist(artist_id, upcoming=True):
   try:
-    if upcoming:
-      comp = operator.ge
-    else:
-      comp = operator.lt
-    return  db.session.query(db.func.count(Show.start_time))\
-                .filter(Artist.id == artist_id, Artist.id == Show.artist_id, comp(Show.start_time, datetime.now()))\
-                .first()[0]
+    return show_counts_per_artist([artist_id])[artist_id]["upcoming" if upcoming else "past"]
   except:
-    print(sys.exc_info())
+    app.logger.exception('show_count_per_artist failed')
 
-def show_list_per_artist(artist_id, upcoming=True):
-  try:
-    if upcoming:
-      comp = operator.ge
-    else:
-      comp = operator.lt
-    shows = db.session.query(Show.venue_id, Show.venue_name, Venue.image_link.label("venue_image_link"), \
-                db.func.cast(Show.start_time, db.String).label("start_time"))\
-                .filter(Artist.id == artist_id, \
-                        Artist.id == Show.artist_id, \
-                        Venue.id == Show.venue_id, \
-                        comp(Show.start_time, datetime.now()))\
-                .all()
-    shows = [s._asdict() for s in shows]
-    return shows
-  except:
-    print(sys.exc_info())
+def artist_show_row(show):
+  return {"venue_id": show.venue_id, "venue_name": show.venue_name,
+          "venue_image_link": show.venue.image_link, "start_time": show.start_time}
 
 
 
@@ -184,22 +663,29 @@ def index():
 #  ----------------------------------------------------------------
 
 @app.route('/venues')
+@response_cache.cached('venues', 'shows')
 def venues():
   # TODO: replace with real venues data.
   #       num_shows should be aggregated based on number of upcoming shows per venue.
+  response = not_modified(counter_listing_validators(Venue))
+  if response:
+    return response
+  data = []
+  page = None
+  facets = []
   try: 
-    data = db.session.query(Venue.city, Venue.state).distinct().all()
-    data = [{**d._asdict(), 'venues': []} for d in data]
-    for city in data:
-      venues_in_city = db.session.query(Venue.id, Venue.name).filter(Venue.city == city["city"]).all()
-      venues_in_city = [{**v._asdict(), 'num_upcoming_shows': show_count_per_venue(v.id)} for v in venues_in_city]
-      city["venues"] = venues_in_city
-      
-    print("/venues : {}".format(data))
+    query = venues_with_upcoming_counts().filter(area_filter(Venue, *area_args()), genre_filter(Venue, *genre_args()))
+    page = keyset_page(query, (Venue.name, Venue.id), **page_args())
+    data = group_venues_by_area(page.items)
+    for v in page.items:
+      response_cache.expire_at(v.next_show_time)
+    facets = genre_facets(Venue, *area_args())
+    app.logger.debug("/venues : %s", data)
   except:
-    print(sys.exc_info())
+    app.logger.exception('venues failed')
+    response_cache.skip()
   finally:
-    return render_template('pages/venues.html', areas=data)
+    return render_template('pages/venues.html', areas=data, page=page, facets=facets)
 
 @app.route('/venues/search', methods=['POST'])
 def search_venues():
@@ -208,42 +694,39 @@ def search_venues():
   # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
   try:
     search_term = request.form.get('search_term', '')
-    venues = db.session.query(Venue.id, Venue.name).filter(Venue.name.ilike(f'%{search_term}%')).all()
-    venues = [x._asdict() for x in venues]
+    matches = name_search(Venue).search(search_term, app.config['SEARCH_LIMIT'])
+    matches = genre_search(Venue, matches, *genre_args(request.form))
+    venues = [{'id': id, 'name': name} for id, name in matches]
+    counts = show_counts_per_venue(v['id'] for v in venues)
     for v in venues:
-      v["num_upcoming_shows"] = show_count_per_venue(v['id'], upcoming=True)
+      v["num_upcoming_shows"] = counts[v['id']]["upcoming"]
     response = {
       "count": len(venues),
       "data": venues
     }
-    print("######## /venues/search : {}".format(response))
+    app.logger.debug("/venues/search : %s", response)
   except:
-    print(sys.exc_info())
+    app.logger.exception('search_venues failed')
   finally:
     return render_template('pages/search_venues.html', results=response, search_term=search_term)
 
 @app.route('/venues/<int:venue_id>')
+@response_cache.cached('venues', 'artists', 'shows')
 def show_venue(venue_id):
   # shows the venue page with the given venue_id
   # TODO: replace with real venue data from the venues table, using venue_id
+  validators = entity_validators(Venue, venue_id)
+  if validators is None:
+    abort(404)
+  response = not_modified(validators)
+  if response:
+    return response
   try: 
-    data = Venue.query.get(venue_id).__dict__
-    del data["_sa_instance_state"]
-
-    data["upcoming_shows_count"] = show_count_per_venue(venue_id, upcoming=True)
-    data["past_shows_count"] = show_count_per_venue(venue_id, upcoming=False)
-    
-    data["upcoming_shows"] = []
-    if data["upcoming_shows_count"]:
-      data["upcoming_shows"] = show_list_per_venue(venue_id, upcoming=True)
-    
-    data["past_shows"] = []
-    if data["past_shows_count"]:
-      data["past_shows"] = show_list_per_venue(venue_id, upcoming=False)
-
-    print(data)
+    data = entity_detail(Venue, venue_id, venue_show_row)
+    app.logger.debug("/venues/id : %s", data)
   except:
-    print(sys.exc_info())
+    app.logger.exception('show_venue failed')
+    response_cache.skip()
   finally:
     return render_template('pages/show_venue.html', venue=data)
 
@@ -268,11 +751,13 @@ def create_venue_submission():
     venue = Venue(**data)
     db.session.add(venue)
     db.session.commit()
-    print("########## /venues/create : {}".format(data))
+    name_search(Venue).invalidate()
+    response_cache.invalidate('venues')
+    app.logger.debug("/venues/create : %s", data)
   except:
     error = True
     db.session.rollback()
-    print(sys.exc_info())
+    app.logger.exception('create_venue_submission failed')
   finally:
     db.session.close()
     if error:
@@ -291,13 +776,21 @@ def delete_venue(venue_id):
   body = {}
   try:
     venue = Venue.query.get(venue_id)
+    # the venue's shows go with it; their artists' counters are refreshed in
+    # the same transaction
+    shows = Show.query.filter(Show.venue_id == venue.id)
+    artist_ids = [s.artist_id for s in shows.with_entities(Show.artist_id).distinct()]
+    shows.delete(synchronize_session=False)
     db.session.delete(venue)
+    refresh_show_counters(Artist, artist_ids)
     db.session.commit()
-    print("########## /venues/id/delete : {}".format(venue))
+    name_search(Venue).invalidate()
+    response_cache.invalidate('venues', 'artists', 'shows')
+    app.logger.debug("/venues/id/delete : %s", venue)
   except:
     error = True
     db.session.rollback()
-    print(sys.exc_info())
+    app.logger.exception('delete_venue failed')
   finally:
     db.session.close()
     if error:
@@ -315,16 +808,27 @@ def delete_venue(venue_id):
 #  Artists
 #  ----------------------------------------------------------------
 @app.route('/artists')
+@response_cache.cached('artists')
 def artists():
   # TODO: replace with real data returned from querying the database
+  response = not_modified(table_validators(Artist))
+  if response:
+    return response
+  artists = []
+  page = None
+  facets = []
   try: 
-    artists = db.session.query(Artist.id, Artist.name).all()
-    artists = [a._asdict() for a in artists]
-    print("/artists : {}".format(artists))
+    query = db.session.query(Artist.id, Artist.name).filter(area_filter(Artist, *area_args()),
+                                                            genre_filter(Artist, *genre_args()))
+    page = keyset_page(query, (Artist.name, Artist.id), **page_args())
+    artists = [a._asdict() for a in page.items]
+    facets = genre_facets(Artist, *area_args())
+    app.logger.debug("/artists : %s", artists)
   except:
-    print(sys.exc_info())
+    app.logger.exception('artists failed')
+    response_cache.skip()
   finally:
-    return render_template('pages/artists.html', artists=artists)
+    return render_template('pages/artists.html', artists=artists, page=page, facets=facets)
 
 @app.route('/artists/search', methods=['POST'])
 def search_artists():
@@ -333,43 +837,40 @@ def search_artists():
   # search for "band" should return "The Wild Sax Band".
   try:
     search_term = request.form.get('search_term', '')
-    artists = db.session.query(Artist.id, Artist.name).filter(Artist.name.ilike(f'%{search_term}%')).all()
-    artists = [x._asdict() for x in artists]
+    matches = name_search(Artist).search(search_term, app.config['SEARCH_LIMIT'])
+    matches = genre_search(Artist, matches, *genre_args(request.form))
+    artists = [{'id': id, 'name': name} for id, name in matches]
+    counts = show_counts_per_artist(a['id'] for a in artists)
     for a in artists:
-      a["num_upcoming_shows"] = show_count_per_artist(a['id'], upcoming=True)
+      a["num_upcoming_shows"] = counts[a['id']]["upcoming"]
     response = {
       "count": len(artists),
       "data": artists
     }
-    print("######## /venues/search : {}".format(response))
+    app.logger.debug("/artists/search : %s", response)
   except:
-    print(sys.exc_info())
+    app.logger.exception('search_artists failed')
   finally:
     return render_template('pages/search_artists.html', results=response, search_term=search_term)
 
 
 @app.route('/artists/<int:artist_id>')
+@response_cache.cached('venues', 'artists', 'shows')
 def show_artist(artist_id):
   # shows the venue page with the given venue_id
   # TODO: replace with real venue data from the venues table, using venue_id
+  validators = entity_validators(Artist, artist_id)
+  if validators is None:
+    abort(404)
+  response = not_modified(validators)
+  if response:
+    return response
   try: 
-    artist = Artist.query.get(artist_id).__dict__
-    del artist["_sa_instance_state"]
-
-    artist["upcoming_shows_count"] = show_count_per_artist(artist_id, upcoming=True)
-    artist["past_shows_count"] = show_count_per_artist(artist_id, upcoming=False)
-    
-    artist["upcoming_shows"] = []
-    if artist["upcoming_shows_count"]:
-      artist["upcoming_shows"] = show_list_per_artist(artist_id, upcoming=True)
-    
-    artist["past_shows"] = []
-    if artist["past_shows_count"]:
-      artist["past_shows"] = show_list_per_artist(artist_id, upcoming=False)
-
-    print("/artists/id : {}".format(artist))
+    artist = entity_detail(Artist, artist_id, artist_show_row)
+    app.logger.debug("/artists/id : %s", artist)
   except:
-    print(sys.exc_info())
+    app.logger.exception('show_artist failed')
+    response_cache.skip()
   finally:
     return render_template('pages/show_artist.html', artist=artist)
 
@@ -398,9 +899,12 @@ def edit_artist_submission(artist_id):
         setattr(artist, key, value)
 
     db.session.commit()
-    print("########### /artists/id/edit : {}".format(artist))
+    name_search(Artist).invalidate()
+    # shows carry copies of the name (and image), see propagate_show_names
+    response_cache.invalidate('artists', 'shows')
+    app.logger.debug("/artists/id/edit : %s", artist)
   except:
-    print(sys.exc_info())
+    app.logger.exception('edit_artist_submission failed')
   finally:
     return redirect(url_for('show_artist', artist_id=artist_id))
 
@@ -426,9 +930,12 @@ def edit_venue_submission(venue_id):
         setattr(venue, key, value)
 
     db.session.commit()
-    print("########### /venues/id/edit : {}".format(venue))
+    name_search(Venue).invalidate()
+    # shows carry copies of the name (and image), see propagate_show_names
+    response_cache.invalidate('venues', 'shows')
+    app.logger.debug("/venues/id/edit : %s", venue)
   except:
-    print(sys.exc_info())
+    app.logger.exception('edit_venue_submission failed')
   finally:
     return redirect(url_for('show_venue', venue_id=venue_id))
 
@@ -454,11 +961,13 @@ def create_artist_submission():
     artist = Artist(**data)
     db.session.add(artist)
     db.session.commit()
-    print("########## /artists/create : {}".format(data))
+    name_search(Artist).invalidate()
+    response_cache.invalidate('artists')
+    app.logger.debug("/artists/create : %s", data)
   except:
     error = True
     db.session.rollback()
-    print(sys.exc_info())
+    app.logger.exception('create_artist_submission failed')
   finally:
     db.session.close()
     if error:
@@ -473,19 +982,55 @@ def create_artist_submission():
 #  ----------------------------------------------------------------
 
 @app.route('/shows')
+@response_cache.cached('shows')
 def shows():
   # displays list of shows at /shows
   # TODO: replace with real shows data.
+  response = not_modified(table_validators(Show))
+  if response:
+    return response
+  shows = []
+  page = None
   try: 
-    shows = db.session.query(Show.venue_id, Show.venue_name, Show.artist_id, Show.artist_name, Show.artist_image_link, 
-                db.func.cast(Show.start_time, db.String).label("start_time"))\
-                .all()
-    shows = [a._asdict() for a in shows]
-    print("/shows : {}".format(shows))
+    query = db.session.query(Show.id, Show.venue_id, Show.venue_name, Show.artist_id, Show.artist_name, Show.artist_image_link, 
+                Show.start_time)\
+                .filter(window_filter(**window_args()))
+    page = keyset_page(query, (Show.start_time, Show.id), **page_args())
+    shows = [a._asdict() for a in page.items]
+    app.logger.debug("/shows : %s", shows)
   except:
-    print(sys.exc_info())
+    app.logger.exception('shows failed')
+    response_cache.skip()
   finally:
-    return render_template('pages/shows.html', shows=shows)
+    return render_template('pages/shows.html', shows=shows, page=page)
+
+@app.route('/shows/calendar')
+@response_cache.cached('shows')
+def shows_calendar():
+  # month grid with the number of shows per day, from a single grouped query
+  response = not_modified(table_validators(Show))
+  if response:
+    return response
+  first, weeks = month_weeks(request.args.get('month'))
+  window = {k: v for k, v in request.args.items() if k in ('venue_id', 'artist_id', 'state', 'city')}
+  cells = []
+  try:
+    start = datetime.combine(weeks[0][0], time())
+    end = datetime.combine(weeks[-1][-1] + timedelta(days=1), time())
+    counts = shows_per_day(**dict(window_args(), start=start, end=end))
+    cells = [[{'date': d, 'count': counts.get(d, 0), 'in_month': d.month == first.month,
+               'url': url_for('shows', **window, **{'from': d.isoformat(), 'to': (d + timedelta(days=1)).isoformat()})}
+              for d in week] for week in weeks]
+  except:
+    app.logger.exception('shows_calendar failed')
+    response_cache.skip()
+  finally:
+    # not strftime('%Y'), which drops the leading zeros of years before 1000
+    prev_month = '{0.year:04}-{0.month:02}'.format(first - timedelta(days=1))
+    next_month = '{0.year:04}-{0.month:02}'.format(first + timedelta(days=31))
+    return render_template('pages/calendar.html', month=first, weeks=cells,
+                           prev_url=url_for('shows_calendar', **window, month=prev_month),
+                           next_url=url_for('shows_calendar', **window, month=next_month))
 
 @app.route('/shows/create')
 def create_shows():
@@ -498,6 +1043,7 @@ def create_show_submission():
   # called to create new shows in the db, upon submitting new show listing form
   # TODO: insert form data as a new Show record in the db, instead
   error = False
+  rejected = None
   body = {}
   try: 
     data = dict(request.form)
@@ -505,22 +1051,37 @@ def create_show_submission():
       raise Exception
     data["venue_id"] = int(data["venue_id"])
     data["artist_id"] = int(data["artist_id"])
-    compl_data = db.session.query(Venue.name.label("venue_name"), Artist.name.label("artist_name"), Artist.image_link.label("artist_image_link"))\
-                      .filter(Venue.id == data["venue_id"], Artist.id == data["artist_id"]).first()
-    if not compl_data:
-      raise Exception
-    data.update(compl_data._asdict())
-    show = Show(**data)
-    db.session.add(show)
-    db.session.commit()
-    print("########## /shows/create : {}".format(data))
+    data["start_time"] = parse_time(data["start_time"])
+    try:
+      data["end_time"] = show_end_time(data["start_time"], parse_time(data.get("end_time")))
+      conflicts = show_conflicts(data["venue_id"], data["artist_id"], data["start_time"], data["end_time"])
+      if conflicts:
+        rejected = conflict_message(conflicts[0], data["venue_id"])
+    except ValueError as e:
+      rejected = str(e)
+    if not rejected:
+      compl_data = db.session.query(Venue.name.label("venue_name"), Artist.name.label("artist_name"), Artist.image_link.label("artist_image_link"))\
+                        .filter(Venue.id == data["venue_id"], Artist.id == data["artist_id"]).first()
+      if not compl_data:
+        raise Exception
+      data.update(compl_data._asdict())
+      show = Show(**data)
+      db.session.add(show)
+      db.session.flush()
+      refresh_show_counters(Venue, [show.venue_id])
+      refresh_show_counters(Artist, [show.artist_id])
+      db.session.commit()
+      response_cache.invalidate('shows')
+      app.logger.debug("/shows/create : %s", data)
   except:
     error = True
     db.session.rollback()
-    print(sys.exc_info())
+    app.logger.exception('create_show_submission failed')
   finally:
     db.session.close()
-    if error:
+    if rejected:
+      flash('Show could not be listed: ' + rejected + '.')
+    elif error:
       # TODO: on unsuccessful db insert, flash an error instead.
       flash('An error occurred. Show could not be listed.')
     else:
@@ -530,6 +1091,563 @@ def create_show_submission():
 
 
 
+@app.route('/shows/<int:show_id>', methods=['DELETE'])
+def delete_show(show_id):
+  error = False
+  try:
+    show = Show.query.get(show_id)
+    db.session.delete(show)
+    db.session.flush()
+    refresh_show_counters(Venue, [show.venue_id])
+    refresh_show_counters(Artist, [show.artist_id])
+    db.session.commit()
+    response_cache.invalidate('shows')
+    app.logger.debug("/shows/id/delete : %s", show)
+  except:
+    error = True
+    db.session.rollback()
+    app.logger.exception('delete_show failed')
+  finally:
+    db.session.close()
+    if error:
+      flash('An error occurred while deleting.')
+    else:
+      flash('Deletion successful')
+    return render_template('pages/home.html')
+
+#  API
+#  ----------------------------------------------------------------
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+# detail responses count the shows they list; the stored show counters are
+# only offered by listings and exports, through counter_fields()
+VENUE_FIELDS = {c.key: c for c in (Venue.id, Venue.name, Venue.city, Venue.state, Venue.address, Venue.phone,
+                                   Venue.image_link, Venue.facebook_link, Venue.genres, Venue.website,
+                                   Venue.seeking_talent, Venue.seeking_description)}
+ARTIST_FIELDS = {c.key: c for c in (Artist.id, Artist.name, Artist.city, Artist.state, Artist.phone,
+                                    Artist.genres, Artist.image_link, Artist.facebook_link, Artist.website,
+                                    Artist.seeking_venue, Artist.seeking_description)}
+SHOW_FIELDS = {c.key: c for c in (Show.id, Show.venue_id, Show.venue_name, Show.artist_id, Show.artist_name,
+                                  Show.artist_image_link, Show.start_time, Show.end_time)}
+LISTING_FIELDS = ('id', 'name', 'city', 'state')
+
+def counter_fields(model, fields):
+  # fields plus the venue's/artist's show counters as of now (see current_counters())
+  counters = dict(current_counters(model), show_count=model.show_count)
+  return dict(fields, **{name: counters[name].label(name)
+                         for name in ('show_count', 'upcoming_show_count', 'next_show_time')})
+
+def api_fields(available, default, required=('id',)):
+  # columns picked with ?fields=a,b (unknown names are ignored), plus the
+  # required ones (ids and pagination keys)
+  requested = request.args.get('fields')
+  names = [f for f in requested.split(',') if f in available] if requested else list(default)
+  names += [f for f in required if f not in names]
+  return [available[n] for n in names]
+
+def api_json(o):
+  if isinstance(o, datetime):
+    return o.isoformat()
+  raise TypeError(repr(o))
+
+def api_response(payload, status=200):
+  if orjson is not None:
+    body = orjson.dumps(payload, default=api_json)
+  else:
+    body = json.dumps(payload, default=api_json, separators=(',', ':'))
+  return Response(body, status=status, mimetype='application/json')
+
+def api_page(available, default, key, *filters, expires=None):
+  # expires: a column with the time each row's values go stale, which caps
+  # how long the page is cached
+  columns = api_fields(available, default, required=[c.key for c in key])
+  if expires is not None:
+    columns.append(expires.label('expires'))
+  page = keyset_page(db.session.query(*columns).filter(*filters), key, **page_args())
+  data = [r._asdict() for r in page.items]
+  if expires is not None:
+    for row in data:
+      response_cache.expire_at(row.pop('expires'))
+  return {'data': data, 'next': page.next_cursor, 'prev': page.prev_cursor}
+
+def api_search(model, counts_for):
+  matches = name_search(model).search(request.args.get('q', ''), app.config['SEARCH_LIMIT'])
+  matches = genre_search(model, matches, *genre_args())
+  counts = counts_for(id for id, _ in matches)
+  data = [{'id': id, 'name': name, 'num_upcoming_shows': counts[id]['upcoming']} for id, name in matches]
+  return {'count': len(data), 'data': data}
+
+def api_detail(model, available, id):
+  # only the requested columns, then the shows as plain rows: two statements
+  # and no ORM objects. None for an unknown id
+  columns = api_fields(available, available)
+  row = db.session.execute(db.select(*columns).where(model.id == id)).first()
+  if row is None:
+    return None
+  shows = db.session.execute(entity_show_rows_query(model, id)).all()
+  return detail_data(model, row, split_shows(shows, show_row_dict), [c.key for c in columns])
+
+@api.route('/venues')
+@response_cache.cached('venues', 'shows')
+def api_venues():
+  response = not_modified(counter_listing_validators(Venue))
+  if response:
+    return response
+  fields = counter_fields(Venue, VENUE_FIELDS)
+  return api_response(api_page(fields, LISTING_FIELDS, (Venue.name, Venue.id),
+                               area_filter(Venue, *area_args()), genre_filter(Venue, *genre_args()),
+                               expires=fields['next_show_time']))
+
+@api.route('/venues/search')
+def api_search_venues():
+  return api_response(api_search(Venue, show_counts_per_venue))
+
+@api.route('/venues/genres')
+def api_venue_genres():
+  return api_response({'data': [{'genre': g, 'count': n} for g, n in genre_facets(Venue, *area_args())]})
+
+@api.route('/venues/<int:venue_id>')
+@response_cache.cached('venues', 'artists', 'shows')
+def api_venue(venue_id):
+  response = not_modified(entity_validators(Venue, venue_id))
+  if response:
+    return response
+  data = api_detail(Venue, VENUE_FIELDS, venue_id)
+  if data is None:
+    return api_response({'error': 'venue not found'}, 404)
+  return api_response(data)
+
+@api.route('/artists')
+@response_cache.cached('artists', 'shows')
+def api_artists():
+  response = not_modified(counter_listing_validators(Artist))
+  if response:
+    return response
+  fields = counter_fields(Artist, ARTIST_FIELDS)
+  return api_response(api_page(fields, LISTING_FIELDS, (Artist.name, Artist.id),
+                               area_filter(Artist, *area_args()), genre_filter(Artist, *genre_args()),
+                               expires=fields['next_show_time']))
+
+@api.route('/artists/search')
+def api_search_artists():
+  return api_response(api_search(Artist, show_counts_per_artist))
+
+@api.route('/artists/genres')
+def api_artist_genres():
+  return api_response({'data': [{'genre': g, 'count': n} for g, n in genre_facets(Artist, *area_args())]})
+
+@api.route('/artists/<int:artist_id>')
+@response_cache.cached('venues', 'artists', 'shows')
+def api_artist(artist_id):
+  response = not_modified(entity_validators(Artist, artist_id))
+  if response:
+    return response
+  data = api_detail(Artist, ARTIST_FIELDS, artist_id)
+  if data is None:
+    return api_response({'error': 'artist not found'}, 404)
+  return api_response(data)
+
+@api.route('/areas')
+@response_cache.cached('venues', 'artists', 'shows')
+def api_areas():
+  areas = area_facets(request.args.get('state') or None)
+  for area in areas:
+    response_cache.expire_at(area.pop('next_show_time'))
+  return api_response({'data': areas})
+
+@api.route('/shows')
+@response_cache.cached('shows')
+def api_shows():
+  response = not_modified(table_validators(Show))
+  if response:
+    return response
+  try:
+    window = window_args()
+  except (ValueError, OverflowError):
+    return api_response({'error': 'from/to must be ISO 8601 times'}, 400)
+  return api_response(api_page(SHOW_FIELDS, SHOW_FIELDS, (Show.start_time, Show.id), window_filter(**window)))
+
+@api.route('/shows/calendar')
+@response_cache.cached('shows')
+def api_shows_calendar():
+  response = not_modified(table_validators(Show))
+  if response:
+    return response
+  try:
+    window = window_args()
+  except (ValueError, OverflowError):
+    return api_response({'error': 'from/to must be ISO 8601 times'}, 400)
+  counts = shows_per_day(**window)
+  return api_response({'data': [{'date': d.isoformat(), 'count': n} for d, n in sorted(counts.items())]})
+
+#  Export
+#  ----------------------------------------------------------------
+
+def export_fields(kind):
+  if kind == 'shows':
+    return SHOW_FIELDS
+  return counter_fields(Venue, VENUE_FIELDS) if kind == 'venues' else counter_fields(Artist, ARTIST_FIELDS)
+
+def export_rows(kind, columns, since=None, until=None, city=None, genre=None):
+  # rows of the export as tuples, fetched through a server-side cursor.
+  # since/until bound show start times (venues and artists with a show in
+  # the range); city and genre filter on the venue and the artist respectively
+  model = {'venues': Venue, 'artists': Artist, 'shows': Show}[kind]
+  query = db.select(*columns)
+  if kind == 'shows':
+    if since is not None:
+      query = query.where(Show.start_time >= since)
+    if until is not None:
+      query = query.where(Show.start_time < until)
+    if city:
+      query = query.where(Show.venue_id.in_(db.select(Venue.id).where(Venue.city == city)))
+    if genre:
+      query = query.where(Show.artist_id.in_(db.select(Artist.id).where(genre_filter(Artist, [genre]))))
+    query = query.order_by(Show.start_time, Show.id)
+  else:
+    if city:
+      query = query.where(model.city == city)
+    if genre:
+      query = query.where(genre_filter(model, [genre]))
+    if since is not None or until is not None:
+      key = Show.venue_id if model is Venue else Show.artist_id
+      shows = db.select(key).where(key == model.id)
+      if since is not None:
+        shows = shows.where(Show.start_time >= since)
+      if until is not None:
+        shows = shows.where(Show.start_time < until)
+      query = query.where(shows.exists())
+    query = query.order_by(model.id)
+  batch_size = app.config['EXPORT_BATCH_SIZE']
+  # yield_per streams results on drivers with server-side cursors (psycopg2)
+  # instead of buffering the whole result
+  for partition in db.session.execute(query.execution_options(yield_per=batch_size)).partitions():
+    for row in partition:
+      yield tuple(row)
+
+@api.route('/export/<any(venues, artists, shows):kind>')
+def api_export(kind):
+  fmt = request.args.get('format', 'csv')
+  if fmt not in exporter.formats():
+    return api_response({'error': 'format must be one of {}'.format(', '.join(exporter.formats()))}, 400)
+  try:
+    since = parse_time(request.args.get('from'))
+    until = parse_time(request.args.get('to'))
+  except (ValueError, OverflowError):
+    return api_response({'error': 'from/to must be ISO 8601 times'}, 400)
+  fields = export_fields(kind)
+  columns = api_fields(fields, fields)
+  rows = export_rows(kind, columns, since, until, request.args.get('city'), request.args.get('genre'))
+  # stream_with_context keeps the request (and its db session) open while the body is sent
+  body = stream_with_context(exporter.stream(rows, columns, fmt, app.config['EXPORT_BATCH_SIZE']))
+  response = Response(body, mimetype=exporter.MIMETYPES[fmt])
+  response.headers['Content-Disposition'] = 'attachment; filename={}.{}'.format(kind, fmt)
+  return response
+
+app.register_blueprint(api)
+
+#  Async views
+#  ----------------------------------------------------------------
+#  Served by asgi.py in place of the views of the same endpoint. A detail
+#  page's validators, row and shows are independent, so all three are read
+#  at once on their own connections; a 304 wastes the last two reads.
+
+async_views = {}
+
+def async_view(endpoint):
+  def decorator(view):
+    async_views[endpoint] = view
+    return view
+  return decorator
+
+async def detail_reads(model, id, show_row):
+  # (validators, entity, split shows) of a detail page; entity is None for an unknown id
+  validators, entity, shows = await asyncio.gather(
+    async_reads.first(entity_validators_query(model, id)),
+    async_reads.scalar(db.select(model).where(model.id == id)),
+    async_reads.scalars(entity_shows_query(model, id)))
+  return entity_validators_of(validators), entity, split_shows(shows, show_row)
+
+async def api_detail_reads(model, available, id):
+  # (validators, columns, row, split shows) of an API detail response, read
+  # like api_detail(); row is None for an unknown id
+  columns = api_fields(available, available)
+  validators, row, shows = await asyncio.gather(
+    async_reads.first(entity_validators_query(model, id)),
+    async_reads.first(db.select(*columns).where(model.id == id)),
+    async_reads.all(entity_show_rows_query(model, id)))
+  return entity_validators_of(validators), columns, row, split_shows(shows, show_row_dict)
+
+@async_view('show_venue')
+@response_cache.cached('venues', 'artists', 'shows')
+async def show_venue_async(venue_id):
+  validators, venue, shows = await detail_reads(Venue, venue_id, venue_show_row)
+  # the reads run at once, so a delete can land between them
+  if validators is None or venue is None:
+    abort(404)
+  response = not_modified(validators)
+  if response:
+    return response
+  data = None
+  try:
+    data = detail_data(Venue, venue, shows)
+    app.logger.debug("/venues/id : %s", data)
+  except:
+    app.logger.exception('show_venue_async failed')
+    response_cache.skip()
+  return render_template('pages/show_venue.html', venue=data)
+
+@async_view('show_artist')
+@response_cache.cached('venues', 'artists', 'shows')
+async def show_artist_async(artist_id):
+  validators, artist, shows = await detail_reads(Artist, artist_id, artist_show_row)
+  # the reads run at once, so a delete can land between them
+  if validators is None or artist is None:
+    abort(404)
+  response = not_modified(validators)
+  if response:
+    return response
+  data = None
+  try:
+    data = detail_data(Artist, artist, shows)
+    app.logger.debug("/artists/id : %s", data)
+  except:
+    app.logger.exception('show_artist_async failed')
+    response_cache.skip()
+  return render_template('pages/show_artist.html', artist=data)
+
+@async_view('api.api_venue')
+@response_cache.cached('venues', 'artists', 'shows')
+async def api_venue_async(venue_id):
+  validators, columns, venue, shows = await api_detail_reads(Venue, VENUE_FIELDS, venue_id)
+  response = not_modified(validators)
+  if response:
+    return response
+  if venue is None:
+    return api_response({'error': 'venue not found'}, 404)
+  return api_response(detail_data(Venue, venue, shows, [c.key for c in columns]))
+
+@async_view('api.api_artist')
+@response_cache.cached('venues', 'artists', 'shows')
+async def api_artist_async(artist_id):
+  validators, columns, artist, shows = await api_detail_reads(Artist, ARTIST_FIELDS, artist_id)
+  response = not_modified(validators)
+  if response:
+    return response
+  if artist is None:
+    return api_response({'error': 'artist not found'}, 404)
+  return api_response(detail_data(Artist, artist, shows, [c.key for c in columns]))
+
+#  Metrics
+#  ----------------------------------------------------------------
+
+@app.route('/metrics')
+def metrics():
+  return jsonify(cache=response_cache.stats(), fragments=fragment_cache.stats(), pool=pool_metrics.snapshot())
+
+
+#  Commands
+#  ----------------------------------------------------------------
+
+@app.cli.command('reconcile-counters')
+def reconcile_counters():
+  """Recompute venue/artist show counters and report rows that had drifted."""
+  for model in (Venue, Artist):
+    drift = show_counter_drift(model)
+    refresh_show_counters(model)
+    db.session.commit()
+    click.echo('{}: {} row(s) with drifted counters repaired'.format(model.__tablename__, drift))
+  response_cache.invalidate('venues', 'artists')
+
+
+IMPORT_COLUMNS = {
+  'venues': ('name', 'city', 'state', 'address', 'phone', 'image_link', 'facebook_link', 'genres', 'website',
+             'seeking_talent', 'seeking_description'),
+  'artists': ('name', 'city', 'state', 'phone', 'genres', 'image_link', 'facebook_link', 'website',
+              'seeking_venue', 'seeking_description'),
+  'shows': ('venue_id', 'artist_id', 'venue_name', 'artist_name', 'artist_image_link', 'start_time', 'end_time'),
+}
+
+def import_lookup(model, columns, rows, key):
+  # one query per chunk: rows reference a venue/artist by id, or by exact name when no id is given
+  ids = {r[key + '_id'] for r in rows if r[key + '_id'] is not None}
+  names = {r[key + '_name'] for r in rows if r[key + '_id'] is None and r[key + '_name']}
+  found = db.session.query(model.id, model.name, *columns).filter(db.or_(model.id.in_(ids), model.name.in_(names))).all()
+  by_name = {}
+  for row in found:
+    by_name.setdefault(row.name, []).append(row)
+  return {row.id: row for row in found}, by_name
+
+def import_schedule(rows):
+  # the stored shows that could overlap any of rows, from one range query over
+  # the rows' venues and artists: only shows starting within
+  # SHOW_MAX_DURATION_MINUTES before the earliest row up to the end of the
+  # latest. {('venue'|'artist', id): ([start times], [(start, end, show)])}
+  if not rows:
+    return {}
+  earliest = min(r['start_time'] for r in rows) - timedelta(minutes=app.config['SHOW_MAX_DURATION_MINUTES'])
+  latest = max(r['end_time'] for r in rows)
+  shows = db.session.query(Show.id, Show.venue_id, Show.venue_name, Show.artist_id, Show.artist_name,
+                           Show.start_time, Show.end_time)\
+              .filter(db.or_(Show.venue_id.in_({r['venue_id'] for r in rows}),
+                             Show.artist_id.in_({r['artist_id'] for r in rows})),
+                      Show.start_time > earliest, Show.start_time < latest, Show.end_time.isnot(None))\
+              .order_by(Show.start_time)
+  schedule = {}
+  for show in shows:
+    for key in (('venue', show.venue_id), ('artist', show.artist_id)):
+      starts, entries = schedule.setdefault(key, ([], []))
+      starts.append(show.start_time)
+      entries.append((show.start_time, show.end_time, show))
+  return schedule
+
+def first_overlap(timeline, start_time, end_time):
+  # the earliest-starting entry of a ([start times], [(start, end, item)])
+  # timeline that overlaps [start_time, end_time), or None. Nothing lasts
+  # longer than SHOW_MAX_DURATION_MINUTES, so only entries starting after
+  # start_time minus that much are looked at
+  if timeline is None:
+    return None
+  starts, entries = timeline
+  lo = bisect.bisect_right(starts, start_time - timedelta(minutes=app.config['SHOW_MAX_DURATION_MINUTES']))
+  for start, end, item in entries[lo:bisect.bisect_left(starts, end_time)]:
+    if end > start_time:
+      return item
+  return None
+
+def book(timeline, start_time, end_time, item):
+  starts, entries = timeline
+  i = bisect.bisect_right(starts, start_time)
+  starts.insert(i, start_time)
+  entries.insert(i, (start_time, end_time, item))
+
+def complete_show_rows(rows):
+  venues, venues_by_name = import_lookup(Venue, (), rows, 'venue')
+  artists, artists_by_name = import_lookup(Artist, (Artist.image_link,), rows, 'artist')
+  resolved, complete, rejects = [], [], []
+  for row in rows:
+    errors = {}
+    for key, by_id, by_name in (('venue', venues, venues_by_name), ('artist', artists, artists_by_name)):
+      if row[key + '_id'] is not None:
+        match = [by_id[row[key + '_id']]] if row[key + '_id'] in by_id else []
+      else:
+        match = by_name.get(row[key + '_name'], [])
+      if len(match) != 1:
+        errors[key] = ['{} {} {}'.format(key, row[key + '_id'] or row[key + '_name'], 'is ambiguous' if match else 'not found')]
+      else:
+        row[key + '_id'] = match[0].id
+        row[key + '_name'] = match[0].name
+    if not errors:
+      try:
+        row['end_time'] = show_end_time(row['start_time'], row['end_time'])
+      except ValueError as e:
+        errors['end_time'] = [str(e)]
+    if errors:
+      rejects.append((row, errors))
+    else:
+      resolved.append(row)
+  # against the stored schedule, then against rows accepted earlier in this
+  # chunk; both are timelines per venue and per artist, searched by bisection
+  stored = import_schedule(resolved)
+  booked = {}
+  for row in resolved:
+    keys = (('venue', row['venue_id']), ('artist', row['artist_id']))
+    clashes = [first_overlap(stored.get(k), row['start_time'], row['end_time']) for k in keys]
+    clashes = [c for c in clashes if c is not None]
+    if clashes:
+      clash = min(clashes, key=lambda show: show.start_time)
+      rejects.append((row, {'schedule': [conflict_message(clash, row['venue_id'])]}))
+      continue
+    others = [first_overlap(booked.get(k), row['start_time'], row['end_time']) for k in keys]
+    others = [o for o in others if o is not None]
+    if others:
+      other = min(others, key=lambda other: other['start_time'])
+      rejects.append((row, {'schedule': ['overlaps another show in the file starting {}'.format(other['start_time'])]}))
+      continue
+    row['artist_image_link'] = artists[row['artist_id']].image_link
+    complete.append(row)
+    for k in keys:
+      book(booked.setdefault(k, ([], [])), row['start_time'], row['end_time'], row)
+  return complete, rejects
+
+def refresh_imported_show_counters(rows):
+  refresh_show_counters(Venue, {r['venue_id'] for r in rows})
+  refresh_show_counters(Artist, {r['artist_id'] for r in rows})
+
+@app.cli.command('sync-show-names')
+@click.option('--batch-size', default=10000, show_default=True, help='Show ids checked per transaction.')
+def sync_show_names(batch_size):
+  """Repair venue/artist names and images copied onto shows that have drifted."""
+  lo, hi = db.session.query(db.func.min(Show.id), db.func.max(Show.id)).one()
+  repaired = 0
+  if lo is not None:
+    for start in range(lo, hi + 1, batch_size):
+      for model in (Venue, Artist):
+        result = db.session.execute(
+          db.update(Show).values(**show_name_values(model))
+            .where(show_name_drift(model, start, start + batch_size))
+            .execution_options(synchronize_session=False))
+        repaired += result.rowcount
+      db.session.commit()
+  if repaired:
+    response_cache.invalidate('shows')
+  click.echo('shows: {} drifted row update(s) repaired'.format(repaired))
+
+@app.cli.command('import')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension.')
+@click.option('--chunk-size', default=1000, show_default=True, help='Rows validated and committed together.')
+@click.option('--checkpoint', type=click.Path(dir_okay=False),
+              help='Progress file; a rerun with the same file resumes after the last committed chunk.')
+@click.option('--rejects', type=click.Path(dir_okay=False), help='Append rejected rows and their errors here as JSONL.')
+def import_rows(kind, path, fmt, chunk_size, checkpoint, rejects):
+  """Bulk load venues, artists or shows from a CSV or JSONL file.
+
+  Rows are validated like the create forms. CSV list cells (genres) are
+  separated by ';'. Shows reference venue_id/artist_id, or venue_name/
+  artist_name for an exact name match.
+  """
+  model = {'venues': Venue, 'artists': Artist, 'shows': Show}[kind]
+  form_class = {'venues': VenueForm, 'artists': ArtistForm, 'shows': ShowForm}[kind]
+  job = importer.Importer(
+    db.session, model.__table__, form_class, IMPORT_COLUMNS[kind],
+    complete=complete_show_rows if kind == 'shows' else None,
+    after_chunk=refresh_imported_show_counters if kind == 'shows' else None,
+    chunk_size=chunk_size,
+    checkpoint=importer.Checkpoint(checkpoint, path) if checkpoint else None,
+    rejects_path=rejects)
+  # the forms read csrf settings from the request context
+  with app.test_request_context():
+    report = job.run(importer.read_rows(path, fmt))
+  if kind == 'shows':
+    # show counters on venues and artists changed as well
+    response_cache.invalidate('venues', 'artists', 'shows')
+  else:
+    name_search(model).invalidate()
+    response_cache.invalidate(kind)
+  click.echo('{}: {}'.format(kind, report))
+
+
+@app.cli.command('export')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.option('--format', 'fmt', type=click.Choice(list(exporter.MIMETYPES)), default='csv', show_default=True)
+@click.option('--output', '-o', type=click.File('wb'), default='-', help='Defaults to stdout.')
+@click.option('--from', 'since', type=click.DateTime(), help='Only shows starting at or after this time.')
+@click.option('--to', 'until', type=click.DateTime(), help='Only shows starting before this time.')
+@click.option('--city', help='Only venues (or shows at venues) in this city.')
+@click.option('--genre', help='Only venues/artists (or shows by artists) with this genre.')
+def export(kind, fmt, output, since, until, city, genre):
+  """Stream venues, artists or shows as CSV, JSONL or Parquet."""
+  if fmt not in exporter.formats():
+    raise click.ClickException('{} export needs pyarrow installed'.format(fmt))
+  columns = list(export_fields(kind).values())
+  rows = export_rows(kind, columns, since, until, city, genre)
+  for chunk in exporter.stream(rows, columns, fmt, app.config['EXPORT_BATCH_SIZE']):
+    output.write(chunk)
+
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
@@ -539,15 +1657,8 @@ def server_error(error):
     return render_template('errors/500.html'), 500
 
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
+conditional.install(app)
+configure_logging(app)
 
 #----------------------------------------------------------------------------#
 # Launch.
@@ -0,0 +1,127 @@
+import io
+import os
+import sys
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.exceptions import HTTPException
+from app import app, async_reads, async_views
+
+#----------------------------------------------------------------------------#
+# ASGI entry point.
+#
+#   uvicorn asgi:application --workers 4
+#   gunicorn -c gunicorn.conf.py          (SERVER_MODE=asgi)
+#
+# GET requests for an endpoint in app.async_views run on the event loop, in
+# a regular Flask request context (before/after request hooks, error
+# handlers, sessions). Every other request goes to the Flask app through
+# asgiref's WsgiToAsgi, which runs it on a thread pool. Without an async
+# database driver installed all requests take that path.
+#----------------------------------------------------------------------------#
+
+
+def wsgi_environ(scope):
+    # the WSGI environ of a bodyless ASGI http request
+    script_name = scope.get('root_path', '').encode('utf8').decode('latin1')
+    path_info = scope['path'].encode('utf8').decode('latin1')
+    if path_info.startswith(script_name):
+        path_info = path_info[len(script_name):]
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': script_name,
+        'PATH_INFO': path_info,
+        'QUERY_STRING': scope['query_string'].decode('ascii'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/{}'.format(scope['http_version']),
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin1').upper().replace('-', '_')
+        if name not in ('CONTENT_LENGTH', 'CONTENT_TYPE'):
+            name = 'HTTP_' + name
+        value = value.decode('latin1')
+        environ[name] = environ[name] + ',' + value if name in environ else value
+    return environ
+
+
+class Application(object):
+
+    def __init__(self, flask_app, views, reads):
+        self.flask_app = flask_app
+        self.views = views if reads.available else {}
+        self.reads = reads
+        self.wsgi = WsgiToAsgi(flask_app)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD') and self.views:
+            environ = wsgi_environ(scope)
+            try:
+                endpoint, args = self.flask_app.url_map.bind_to_environ(environ).match()
+            except HTTPException:
+                endpoint = None
+            if endpoint in self.views:
+                return await self.dispatch(self.views[endpoint], environ, args, send)
+        return await self.wsgi(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.reads.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def dispatch(self, view, environ, args, send):
+        # Flask's full_dispatch_request() around an awaited view
+        flask_app = self.flask_app
+        ctx = flask_app.request_context(environ)
+        error = None
+        ctx.push()
+        try:
+            try:
+                try:
+                    rv = flask_app.preprocess_request()
+                    if rv is None:
+                        rv = await view(**args)
+                except Exception as e:
+                    rv = flask_app.handle_user_exception(e)
+                response = flask_app.finalize_request(rv)
+            except Exception as e:
+                error = e
+                response = flask_app.handle_exception(e)
+            # what a WSGI server would send: no body for HEAD or 304, headers to match
+            app_iter, status, headers = response.get_wsgi_response(environ)
+            body = b''.join(app_iter)
+            response.close()
+        finally:
+            ctx.pop(error)
+        await send({'type': 'http.response.start', 'status': int(status.split(' ', 1)[0]),
+                    'headers': [(k.lower().encode('latin1'), v.encode('latin1')) for k, v in headers]})
+        await send({'type': 'http.response.body', 'body': body})
+
+
+application = Application(app, async_views, async_reads)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+    # as in gunicorn.conf.py: a per-process cache is only invalidated in the worker that took the write
+    if app.config['CACHE_BACKEND'] == 'memory' and workers > 1:
+        raise RuntimeError('CACHE_BACKEND=memory with {} workers: each worker would keep serving pages the '
+                           'others have invalidated. Set CACHE_BACKEND=redis (or null), or run one worker.'
+                           .format(workers))
+    uvicorn.run('asgi:application', host=os.environ.get('HOST', '0.0.0.0'), port=int(os.environ.get('PORT', 8000)),
+                workers=workers)
@@ -0,0 +1,166 @@
+import itertools
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from werkzeug.serving import WSGIRequestHandler, make_server
+try:
+    import uvicorn
+except ImportError:
+    uvicorn = None
+
+#----------------------------------------------------------------------------#
+# Benchmarks.
+#
+# time_calls() runs a helper repeatedly in-process; load() sends a fixed
+# number of requests to one route from a pool of client threads, wrk-style.
+# Both return a Result with p50/p95/p99 latency and operations per second.
+# serve() runs the app on a local threaded werkzeug server, so a load test
+# needs nothing but the database the app is configured with; serve_asgi()
+# does the same for asgi.py on uvicorn.
+#----------------------------------------------------------------------------#
+
+
+def percentile(samples, p):
+    """p-th percentile (0-100) of sorted samples, by linear interpolation."""
+    if not samples:
+        return None
+    k = (len(samples) - 1) * p / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(samples) - 1)
+    return samples[lo] + (samples[hi] - samples[lo]) * (k - lo)
+
+
+class Result(object):
+
+    def __init__(self, name, samples, elapsed, errors=0):
+        self.name = name
+        self.samples = sorted(samples)
+        self.elapsed = elapsed
+        self.errors = errors
+
+    def ms(self, p):
+        value = percentile(self.samples, p)
+        return value * 1000.0 if value is not None else None
+
+    @property
+    def per_sec(self):
+        return len(self.samples) / self.elapsed if self.elapsed else 0.0
+
+    def row(self):
+        return (self.name, len(self.samples), self.errors, self.ms(50), self.ms(95), self.ms(99), self.per_sec)
+
+
+HEADER = ('name', 'n', 'errors', 'p50 ms', 'p95 ms', 'p99 ms', 'per sec')
+
+
+def table(results):
+    rows = [r.row() for r in results]
+    width = max([len(HEADER[0])] + [len(r[0]) for r in rows])
+    lines = ['{:<{w}} {:>6} {:>6} {:>9} {:>9} {:>9} {:>9}'.format(*HEADER, w=width)]
+    for name, n, errors, p50, p95, p99, per_sec in rows:
+        lines.append('{:<{w}} {:>6} {:>6} {:>9.2f} {:>9.2f} {:>9.2f} {:>9.1f}'.format(
+            name, n, errors, p50 or 0.0, p95 or 0.0, p99 or 0.0, per_sec, w=width))
+    return '\n'.join(lines)
+
+
+def time_calls(name, fn, args, repeat=200, warmup=10, after=None):
+    """Call fn(*a) repeat times, cycling through the argument tuples in args.
+
+    after() runs untimed after every call, e.g. to reset a session the way
+    the end of a request would.
+    """
+    args = itertools.cycle(args or [()])
+    for _ in range(warmup):
+        fn(*next(args))
+        if after:
+            after()
+    samples = []
+    elapsed = 0.0
+    for _ in range(repeat):
+        a = next(args)
+        t = time.perf_counter()
+        fn(*a)
+        samples.append(time.perf_counter() - t)
+        elapsed += samples[-1]
+        if after:
+            after()
+    return Result(name, samples, elapsed)
+
+
+class QuietHandler(WSGIRequestHandler):
+    # no access line per request on stdout
+
+    def log_request(self, code='-', size='-'):
+        pass
+
+
+@contextmanager
+def serve(app, host='127.0.0.1', port=0):
+    """Run app on a threaded local server for the duration of the block; yields its base url."""
+    server = make_server(host, port, app, threaded=True, request_handler=QuietHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield 'http://{}:{}'.format(host, server.server_port)
+    finally:
+        server.shutdown()
+        thread.join()
+
+
+@contextmanager
+def serve_asgi(application, host='127.0.0.1', port=0):
+    """Like serve(), on a single uvicorn worker."""
+    if uvicorn is None:
+        raise RuntimeError('serving ASGI needs uvicorn installed')
+    server = uvicorn.Server(uvicorn.Config(application, host=host, port=port, log_level='warning', access_log=False))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError('uvicorn failed to start')
+        time.sleep(0.01)
+    try:
+        yield 'http://{}:{}'.format(host, server.servers[0].sockets[0].getsockname()[1])
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+def fetch(url, form=None, timeout=30):
+    # status code of a GET, or of a form POST when form is given; the body is read in full
+    data = urllib.parse.urlencode(form, doseq=True).encode('utf-8') if form is not None else None
+    try:
+        with urllib.request.urlopen(url, data=data, timeout=timeout) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        return e.code
+
+
+def load(name, base_url, paths, requests=200, concurrency=8, form=None):
+    """Send requests to base_url + paths (cycled) from concurrency threads.
+
+    Responses other than 2xx/3xx, and connection failures, count as errors
+    and are left out of the latency samples.
+    """
+    paths = itertools.cycle(paths)
+    urls = [base_url + next(paths) for _ in range(requests)]
+
+    def one(url):
+        t = time.perf_counter()
+        try:
+            ok = fetch(url, form) < 400
+        except (OSError, urllib.error.URLError):
+            ok = False
+        return ok, time.perf_counter() - t
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(one, urls))
+    elapsed = time.perf_counter() - started
+    return Result(name, [t for ok, t in outcomes if ok], elapsed, errors=sum(1 for ok, _ in outcomes if not ok))
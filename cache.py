@@ -0,0 +1,267 @@
+import inspect
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from functools import wraps
+from urllib.parse import urlencode
+from flask import Response, g, make_response, request, session
+from conditional import discard_validators, set_validators
+
+#----------------------------------------------------------------------------#
+# Response cache.
+#
+# Rendered GET responses are stored per route and query string. Each cached
+# route depends on one or more namespaces ('venues', 'artists', 'shows');
+# every namespace has a generation number that is part of the key, so
+# invalidating a namespace is a single counter bump and stale entries simply
+# age out of the backend.
+#
+# Pages that split shows into upcoming and past go stale on their own when a
+# show's start_time passes. Views report that moment with expire_at() and the
+# entry expires exactly then, so the default timeout can be long.
+#----------------------------------------------------------------------------#
+
+
+class LRUCache(object):
+    """In-process LRU with per-entry expiry and a bound on the number of entries."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[key]
+                self.expirations += 1
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        expires_at = time.time() + timeout if timeout else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def counter(self, name):
+        return self._counters.get(name, 0)
+
+    def incr(self, name):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + 1
+            return self._counters[name]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {'entries': len(self._data), 'max_entries': self.max_entries,
+                'evictions': self.evictions, 'expirations': self.expirations}
+
+
+class RedisCache(object):
+    """Backend for any redis-py compatible client (redis.Redis, fakeredis)."""
+
+    def __init__(self, client, prefix='fyyur:'):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND = 'redis' requires the redis package")
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return None if raw is None else pickle.loads(raw)
+
+    def set(self, key, value, timeout=None):
+        self.client.set(self.prefix + key, pickle.dumps(value), px=int(timeout * 1000) if timeout else None)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def counter(self, name):
+        return int(self.client.get(self.prefix + 'counter:' + name) or 0)
+
+    def incr(self, name):
+        return self.client.incr(self.prefix + 'counter:' + name)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+    def stats(self):
+        info = self.client.info('stats')
+        return {'evictions': info.get('evicted_keys', 0), 'expirations': info.get('expired_keys', 0)}
+
+
+class NullCache(object):
+    """Stores nothing; every lookup is a miss."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, timeout=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def counter(self, name):
+        return 0
+
+    def incr(self, name):
+        return 0
+
+    def clear(self):
+        pass
+
+    def stats(self):
+        return {}
+
+
+def backend_from_config(config):
+    name = config.get('CACHE_BACKEND', 'memory')
+    if name == 'memory':
+        return LRUCache(config.get('CACHE_MAX_ENTRIES', 1024))
+    if name == 'redis':
+        return RedisCache.from_url(config['CACHE_REDIS_URL'])
+    if name == 'null':
+        return NullCache()
+    raise ValueError('unknown CACHE_BACKEND {!r}'.format(name))
+
+
+class ResponseCache(object):
+
+    def __init__(self, backend, default_timeout=300):
+        self.backend = backend
+        self.default_timeout = default_timeout
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _count(self, attr):
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+    def generations(self, namespaces):
+        return ':'.join('{}{}'.format(ns, self.backend.counter('gen:' + ns)) for ns in namespaces)
+
+    def invalidate(self, *namespaces):
+        for ns in namespaces:
+            self.backend.incr('gen:' + ns)
+
+    def request_key(self, namespaces):
+        # urlencoded, so a value containing '&' or '=' cannot pass for several args
+        query = urlencode(sorted(request.args.items(multi=True)))
+        return 'view:{}:{}?{}'.format(self.generations(namespaces), request.path, query)
+
+    def memoize(self, key, namespaces, compute, timeout=None):
+        """compute()'s result, cached under key until one of namespaces is invalidated."""
+        full_key = 'value:{}:{}'.format(self.generations(namespaces), key)
+        value = self.backend.get(full_key)
+        if value is None:
+            value = compute()
+            self.backend.set(full_key, value, timeout or self.default_timeout)
+        return value
+
+    def expire_at(self, when):
+        """Cap the lifetime of the response being rendered at when (naive local time)."""
+        if when is not None and (g.get('cache_expires_at') is None or when < g.cache_expires_at):
+            g.cache_expires_at = when
+
+    def skip(self):
+        """Keep the response being rendered out of the cache and without
+        validators, e.g. an error fallback rendered with status 200."""
+        g.cache_skip = True
+        discard_validators()
+
+    def _timeout(self, timeout):
+        timeout = timeout or self.default_timeout
+        expires_at = g.pop('cache_expires_at', None)
+        if expires_at is not None:
+            timeout = min(timeout, (expires_at - datetime.now()).total_seconds())
+        return timeout
+
+    def _lookup(self, namespaces):
+        # (key, cached response or None); no key when the response must not be
+        # cached: pending flash messages must be rendered, and never cached
+        if request.method != 'GET' or '_flashes' in session:
+            return None, None
+        key = self.request_key(namespaces)
+        entry = self.backend.get(key)
+        if entry is not None:
+            self._count('hits')
+            body, status, headers = entry
+            return key, Response(body, status=status, headers=headers).make_conditional(request)
+        self._count('misses')
+        g.pop('cache_expires_at', None)
+        return key, None
+
+    def _store(self, key, rv, timeout):
+        # validators are stamped here, not only in after_request, so they are
+        # stored with the entry
+        response = set_validators(make_response(rv))
+        ttl = self._timeout(timeout)
+        if response.status_code == 200 and not response.is_streamed and '_flashes' not in session and ttl > 0 \
+                and not g.get('cache_skip'):
+            entry = (response.get_data(), response.status_code, list(response.headers.items()))
+            self.backend.set(key, entry, ttl)
+        return response
+
+    def cached(self, *namespaces, timeout=None):
+        """Cache a GET view's 200 responses until one of namespaces is invalidated.
+
+        The view may be a coroutine function (the async views of asgi.py).
+        """
+        def decorator(view):
+            if inspect.iscoroutinefunction(view):
+                @wraps(view)
+                async def async_wrapper(*args, **kwargs):
+                    key, response = self._lookup(namespaces)
+                    if key is None:
+                        return await view(*args, **kwargs)
+                    if response is not None:
+                        return response
+                    return self._store(key, await view(*args, **kwargs), timeout)
+                return async_wrapper
+
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                key, response = self._lookup(namespaces)
+                if key is None:
+                    return view(*args, **kwargs)
+                if response is not None:
+                    return response
+                return self._store(key, view(*args, **kwargs), timeout)
+            return wrapper
+        return decorator
+
+    def stats(self):
+        total = self.hits + self.misses
+        return dict(self.backend.stats(), hits=self.hits, misses=self.misses,
+                    hit_ratio=(float(self.hits) / total) if total else None)
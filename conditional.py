@@ -0,0 +1,66 @@
+import hashlib
+from datetime import timezone
+from flask import Response, g, request, session
+
+#----------------------------------------------------------------------------#
+# Conditional requests.
+#
+# Views compute a few cheap aggregate values that change whenever their page
+# would (row counts, max updated_at, how many shows are still upcoming) and
+# call not_modified() before doing any real work. Those values become the
+# ETag and Last-Modified of the response; when the client already holds that
+# version a bare 304 is returned without rendering anything.
+#----------------------------------------------------------------------------#
+
+
+def not_modified(*values, last_modified=None):
+    """A 304 response if the client's copy matches values, else None.
+
+    last_modified is a naive local datetime, like the rest of the app's
+    timestamps. Validators are kept on g and added to the final response by
+    set_validators().
+    """
+    # a pending flash message has to be rendered, so the client's copy is stale
+    if '_flashes' in session:
+        return None
+    etag = hashlib.sha1(repr((request.full_path,) + values).encode('utf-8')).hexdigest()
+    if last_modified is not None:
+        last_modified = last_modified.astimezone(timezone.utc).replace(microsecond=0)
+    g.etag = etag
+    g.last_modified = last_modified
+
+    if request.if_none_match:
+        fresh = request.if_none_match.contains(etag)
+    elif request.if_modified_since is not None and last_modified is not None:
+        since = request.if_modified_since
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        fresh = last_modified <= since
+    else:
+        fresh = False
+    if fresh:
+        return set_validators(Response(status=304))
+    return None
+
+
+def set_validators(response):
+    if g.get('etag') is not None and response.status_code in (200, 304):
+        response.set_etag(g.etag)
+        if g.last_modified is not None:
+            response.last_modified = g.last_modified
+    return response
+
+
+def discard_validators():
+    # the response being rendered is not the version the validators describe
+    g.pop('etag', None)
+    g.pop('last_modified', None)
+
+
+def latest(*times):
+    times = [t for t in times if t is not None]
+    return max(times) if times else None
+
+
+def install(app):
+    app.after_request(set_validators)
@@ -0,0 +1,124 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from importer import LIST_SEPARATOR
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+#----------------------------------------------------------------------------#
+# Streaming export.
+#
+# Rows come from a server-side cursor (yield_per) and are encoded batch by
+# batch, so memory use does not grow with the size of the export and the
+# first bytes go out as soon as the first batch is fetched. CSV and JSONL
+# are always available; Parquet needs pyarrow and writes one row group per
+# batch.
+#----------------------------------------------------------------------------#
+
+MIMETYPES = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+def formats():
+    return [f for f in MIMETYPES if f != 'parquet' or pyarrow is not None]
+
+
+def batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _json_default(o):
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    raise TypeError(repr(o))
+
+
+def _csv_value(value):
+    if isinstance(value, (list, tuple)):
+        return LIST_SEPARATOR.join(value)
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return value
+
+
+def csv_stream(rows, columns, batch_size):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow([c.key for c in columns])
+    yield buf.getvalue().encode('utf-8')
+    for batch in batched(rows, batch_size):
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows([_csv_value(v) for v in row] for row in batch)
+        yield buf.getvalue().encode('utf-8')
+
+
+def jsonl_stream(rows, columns, batch_size):
+    names = [c.key for c in columns]
+    for batch in batched(rows, batch_size):
+        yield ''.join(json.dumps(dict(zip(names, row)), default=_json_default) + '\n' for row in batch).encode('utf-8')
+
+
+def _arrow_type(column):
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return pyarrow.string()
+    return {
+        bool: pyarrow.bool_(),
+        int: pyarrow.int64(),
+        float: pyarrow.float64(),
+        datetime: pyarrow.timestamp('us'),
+        date: pyarrow.date32(),
+        list: pyarrow.list_(pyarrow.string()),
+    }.get(python_type, pyarrow.string())
+
+
+class _Sink(io.RawIOBase):
+    # write-only file that hands out what was written since the last drain()
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self):
+        data, self.chunks = b''.join(self.chunks), []
+        return data
+
+
+def parquet_stream(rows, columns, batch_size):
+    schema = pyarrow.schema([(c.key, _arrow_type(c)) for c in columns])
+    sink = _Sink()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema)
+    for batch in batched(rows, batch_size):
+        writer.write_table(pyarrow.Table.from_pylist([dict(zip(schema.names, row)) for row in batch], schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def stream(rows, columns, fmt, batch_size=1000):
+    """Encoded chunks (bytes) of rows, which are tuples in the order of columns."""
+    if fmt not in formats():
+        raise ValueError('unsupported export format {!r}'.format(fmt))
+    return {'csv': csv_stream, 'jsonl': jsonl_stream, 'parquet': parquet_stream}[fmt](rows, columns, batch_size)
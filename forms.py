@@ -1,7 +1,12 @@
 from datetime import datetime
 from flask_wtf import Form
 from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField
-from wtforms.validators import DataRequired, AnyOf, URL
+from wtforms.validators import DataRequired, InputRequired, AnyOf, URL, Optional
+
+# the form's own format, then ISO 8601 as written by exports and
+# datetime-local inputs
+DATETIME_FORMATS = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M:%S.%f',
+                    '%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M']
 
 class ShowForm(Form):
     artist_id = StringField(
@@ -12,9 +17,16 @@ class ShowForm(Form):
     )
     start_time = DateTimeField(
         'start_time',
-        validators=[DataRequired()],
+        # InputRequired, so an unreadable time reports that rather than a missing field
+        validators=[InputRequired()],
+        format=DATETIME_FORMATS,
         default= datetime.today()
     )
+    end_time = DateTimeField(
+        'end_time',
+        validators=[Optional()],
+        format=DATETIME_FORMATS
+    )
 
 class VenueForm(Form):
     name = StringField(
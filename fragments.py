@@ -0,0 +1,103 @@
+import os
+import threading
+from flask import g, has_request_context
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+#----------------------------------------------------------------------------#
+# Template caching.
+#
+# Compiled templates are kept on disk by a FileSystemBytecodeCache, so a new
+# worker skips the Jinja compile step. Inside templates,
+#
+#   {% cache ('show', show.id), 600 %} ... {% endcache %}
+#
+# keeps the rendered block in a cache backend. Fragment keys carry the
+# generations of the response cache namespaces, so the same invalidate()
+# calls that drop cached pages drop their tiles too.
+#----------------------------------------------------------------------------#
+
+
+class FragmentCache(object):
+
+    def __init__(self, backend, response_cache, namespaces, default_timeout=300):
+        self.backend = backend
+        self.response_cache = response_cache
+        self.namespaces = namespaces
+        self.default_timeout = default_timeout
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _prefix(self):
+        # namespace generations are read once per request, not once per fragment
+        if not has_request_context():
+            return self.response_cache.generations(self.namespaces)
+        prefix = g.get('fragment_prefix')
+        if prefix is None:
+            prefix = g.fragment_prefix = self.response_cache.generations(self.namespaces)
+        return prefix
+
+    def get_or_render(self, template, key, timeout, render):
+        full_key = 'fragment:{}:{}:{!r}'.format(self._prefix(), template, key)
+        value = self.backend.get(full_key)
+        if value is not None:
+            with self._lock:
+                self.hits += 1
+            return Markup(value)
+        with self._lock:
+            self.misses += 1
+        value = render()
+        self.backend.set(full_key, str(value), timeout or self.default_timeout)
+        return Markup(value)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return dict(self.backend.stats(), hits=self.hits, misses=self.misses,
+                    hit_ratio=(float(self.hits) / total) if total else None)
+
+
+class CacheExtension(Extension):
+    """{% cache key[, timeout] %}...{% endcache %}, stored in environment.fragment_cache."""
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super(CacheExtension, self).__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [nodes.Const(parser.name), parser.parse_expression()]
+        if parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        else:
+            args.append(nodes.Const(None))
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render', args), [], [], body).set_lineno(lineno)
+
+    def _render(self, template, key, timeout, caller):
+        cache = self.environment.fragment_cache
+        if cache is None:
+            return caller()
+        return cache.get_or_render(template, key, timeout, caller)
+
+
+def private_dir(path):
+    """path, created 0700 if missing; refuses a directory owned by another user
+    or writable by others, whose bytecode could be swapped for someone else's."""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.lstat(path)
+    if not os.path.isdir(path) or os.path.islink(path) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise RuntimeError('{} must be a directory owned by this user with mode 0700'.format(path))
+    return path
+
+
+def install(app, fragment_cache, bytecode_cache=True, bytecode_cache_dir=None):
+    env = app.jinja_env
+    if bytecode_cache:
+        # without a directory Jinja uses a per-user one it creates 0700 and checks the owner of
+        env.bytecode_cache = FileSystemBytecodeCache(private_dir(bytecode_cache_dir) if bytecode_cache_dir else None)
+    env.add_extension(CacheExtension)
+    env.fragment_cache = fragment_cache
@@ -0,0 +1,71 @@
+import multiprocessing
+import os
+import config as app_config  # not "config", which is a gunicorn setting
+
+#----------------------------------------------------------------------------#
+# Production server: gunicorn -c gunicorn.conf.py
+#
+# SERVER_MODE=wsgi (default) serves app:app on threaded sync workers;
+# SERVER_MODE=asgi serves asgi:application on uvicorn workers. Every worker
+# has its own connection pools (DB_POOL_SIZE + DB_MAX_OVERFLOW, plus
+# ASYNC_DB_POOL_SIZE + ASYNC_DB_MAX_OVERFLOW in asgi mode), so the default
+# number of workers is what fits in DB_MAX_CONNECTIONS after
+# DB_RESERVED_CONNECTIONS are kept for migrations and admin sessions.
+#
+# CACHE_BACKEND=memory keeps a response cache per process, and a write only
+# invalidates the cache of the worker that served it; that backend runs one
+# worker, and the server refuses to start with more. Use redis (or null) to
+# run several.
+#----------------------------------------------------------------------------#
+
+SERVER_MODE = os.environ.get('SERVER_MODE', 'wsgi')
+DB_MAX_CONNECTIONS = int(os.environ.get('DB_MAX_CONNECTIONS', 100))
+DB_RESERVED_CONNECTIONS = int(os.environ.get('DB_RESERVED_CONNECTIONS', 10))
+
+
+def connections_per_worker():
+    options = app_config.SQLALCHEMY_ENGINE_OPTIONS
+    connections = options.get('pool_size', 1) + options.get('max_overflow', 0)
+    if SERVER_MODE == 'asgi':
+        connections += app_config.ASYNC_DB_POOL_SIZE + app_config.ASYNC_DB_MAX_OVERFLOW
+    return connections
+
+
+def default_workers():
+    if app_config.CACHE_BACKEND == 'memory':
+        return 1
+    fit = (DB_MAX_CONNECTIONS - DB_RESERVED_CONNECTIONS) // connections_per_worker()
+    return max(1, min(multiprocessing.cpu_count() * 2 + 1, fit))
+
+
+bind = os.environ.get('BIND', '0.0.0.0:{}'.format(os.environ.get('PORT', 8000)))
+workers = int(os.environ.get('WEB_CONCURRENCY', default_workers()))
+timeout = int(os.environ.get('WORKER_TIMEOUT', 30))
+graceful_timeout = timeout
+keepalive = 5
+# recycle workers now and then so a slow leak can't grow without bound
+max_requests = int(os.environ.get('MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+
+if SERVER_MODE == 'asgi':
+    wsgi_app = 'asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'app:app'
+    worker_class = 'gthread'
+    # requests served at once per worker; at most DB_POOL_SIZE of them get a connection without waiting
+    threads = int(os.environ.get('WORKER_THREADS', 4))
+
+
+def on_starting(server):
+    workers = server.cfg.workers
+    if app_config.CACHE_BACKEND == 'memory' and workers > 1:
+        raise RuntimeError('CACHE_BACKEND=memory with {} workers: each worker would keep serving pages the '
+                           'others have invalidated. Set CACHE_BACKEND=redis (or null), or run one worker.'
+                           .format(workers))
+    needed = workers * connections_per_worker()
+    if needed > DB_MAX_CONNECTIONS - DB_RESERVED_CONNECTIONS:
+        server.log.warning('%d workers may open %d database connections, more than the %d of '
+                           'DB_MAX_CONNECTIONS=%d left after DB_RESERVED_CONNECTIONS; lower WEB_CONCURRENCY '
+                           'or the pool sizes', workers, needed, DB_MAX_CONNECTIONS - DB_RESERVED_CONNECTIONS,
+                           DB_MAX_CONNECTIONS)
@@ -0,0 +1,241 @@
+import csv
+import io
+import json
+import os
+import time
+from datetime import datetime
+from itertools import islice
+from werkzeug.datastructures import MultiDict
+
+#----------------------------------------------------------------------------#
+# Bulk import.
+#
+# Rows are streamed from CSV or JSONL files and processed in chunks: each row
+# is validated with the same WTForms form the web handlers use, the chunk is
+# completed (e.g. shows get their denormalized venue/artist names in one
+# lookup), loaded with COPY on Postgres or executemany elsewhere and
+# committed. A checkpoint file records how many input rows are done, so an
+# interrupted import resumes after the last committed chunk.
+#----------------------------------------------------------------------------#
+
+# separator for list values (genres) in CSV cells
+LIST_SEPARATOR = ';'
+
+
+def read_rows(path, fmt=None):
+    fmt = fmt or ('jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            for row in csv.DictReader(f):
+                yield row
+        elif fmt == 'jsonl':
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            raise ValueError('unknown format {!r}'.format(fmt))
+
+
+def chunked(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Checkpoint(object):
+    """Number of input rows of a file already committed, kept in a JSON file."""
+
+    def __init__(self, path, source):
+        self.path = path
+        self.source = os.path.abspath(source)
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        with open(self.path) as f:
+            state = json.load(f)
+        return state['rows_done'] if state.get('source') == self.source else 0
+
+    def save(self, rows_done):
+        if not self.path:
+            return
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'source': self.source, 'rows_done': rows_done, 'saved_at': datetime.now().isoformat()}, f)
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class ImportReport(object):
+
+    def __init__(self, skipped=0):
+        self.skipped = skipped
+        self.read = 0
+        self.loaded = 0
+        self.rejected = 0
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_sec(self):
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return '{} read, {} loaded, {} rejected, {} skipped (checkpoint) in {:.2f}s ({:.0f} rows/sec)'.format(
+            self.read, self.loaded, self.rejected, self.skipped, self.elapsed, self.rows_per_sec)
+
+
+def _coerce(column, value):
+    if isinstance(value, str):
+        value = value.strip()
+        if value == '':
+            return None
+    if value is None:
+        return None
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if python_type is bool and isinstance(value, str):
+        return value.lower() in ('1', 'true', 't', 'yes', 'y')
+    if python_type is list and isinstance(value, str):
+        return [v.strip() for v in value.split(LIST_SEPARATOR) if v.strip()]
+    if python_type is int and isinstance(value, str):
+        return int(value)
+    if python_type is datetime and isinstance(value, str):
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+    return value
+
+
+def _formdata(row):
+    data = MultiDict()
+    for key, value in row.items():
+        if isinstance(value, list):
+            data.setlist(key, [str(v) for v in value])
+        elif isinstance(value, str) and LIST_SEPARATOR in value and key == 'genres':
+            data.setlist(key, [v.strip() for v in value.split(LIST_SEPARATOR) if v.strip()])
+        elif value is not None:
+            data[key] = str(value)
+    return data
+
+
+def _pg_array(values):
+    return '{' + ','.join('"' + str(v).replace('\\', '\\\\').replace('"', '\\"') + '"' for v in values) + '}'
+
+
+def _copy_value(value):
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (list, tuple)):
+        return _pg_array(value)
+    if isinstance(value, datetime):
+        return value.isoformat(' ')
+    return value
+
+
+def load_chunk(session, table, columns, rows):
+    """Insert rows into table: COPY ... FROM STDIN on psycopg2, executemany otherwise."""
+    connection = session.connection()
+    if connection.dialect.name == 'postgresql':
+        cursor = connection.connection.cursor()
+        if hasattr(cursor, 'copy_expert'):
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            for row in rows:
+                # unquoted empty fields are NULL in COPY's csv format
+                writer.writerow(['' if v is None else v for v in (_copy_value(row.get(c)) for c in columns)])
+            buf.seek(0)
+            cursor.copy_expert('COPY {} ({}) FROM STDIN WITH (FORMAT csv)'.format(table.name, ', '.join(columns)), buf)
+            return
+    session.execute(table.insert(), [{c: row.get(c) for c in columns} for row in rows])
+
+
+class Importer(object):
+    """Validate, complete and load rows of one table in committed chunks.
+
+    form_class validates each row; columns are the table columns to load.
+    complete(rows) may fill in derived columns for a whole chunk and return
+    (rows, rejects) where rejects are (row, errors) pairs. after_chunk(rows)
+    runs inside the chunk's transaction, before commit.
+    """
+
+    def __init__(self, session, table, form_class, columns, complete=None, after_chunk=None,
+                 chunk_size=1000, checkpoint=None, rejects_path=None):
+        self.session = session
+        self.table = table
+        self.form_class = form_class
+        self.columns = columns
+        self.complete = complete
+        self.after_chunk = after_chunk
+        self.chunk_size = chunk_size
+        self.checkpoint = checkpoint
+        self.rejects_path = rejects_path
+
+    def validate(self, row):
+        form = self.form_class(formdata=_formdata(row), meta={'csrf': False})
+        if not form.validate():
+            return None, form.errors
+        data = form.data
+        values = {}
+        for name in self.columns:
+            column = self.table.c[name]
+            if data.get(name) not in (None, ''):
+                values[name] = _coerce(column, data[name])
+            else:
+                values[name] = _coerce(column, row.get(name))
+        return values, None
+
+    def run(self, rows):
+        done = self.checkpoint.load() if self.checkpoint else 0
+        report = ImportReport(skipped=done)
+        rejects = open(self.rejects_path, 'a') if self.rejects_path else None
+        try:
+            for chunk in chunked(islice(rows, done, None), self.chunk_size):
+                valid, failed = [], []
+                for row in chunk:
+                    try:
+                        values, errors = self.validate(row)
+                    except (ValueError, TypeError) as e:
+                        values, errors = None, {'row': [str(e)]}
+                    if errors:
+                        failed.append((row, errors))
+                    else:
+                        valid.append(values)
+                if self.complete and valid:
+                    valid, incomplete = self.complete(valid)
+                    failed.extend(incomplete)
+                try:
+                    if valid:
+                        load_chunk(self.session, self.table, self.columns, valid)
+                        if self.after_chunk:
+                            self.after_chunk(valid)
+                    self.session.commit()
+                except Exception:
+                    self.session.rollback()
+                    raise
+                done += len(chunk)
+                if self.checkpoint:
+                    self.checkpoint.save(done)
+                report.read += len(chunk)
+                report.loaded += len(valid)
+                report.rejected += len(failed)
+                if rejects:
+                    for row, errors in failed:
+                        rejects.write(json.dumps({'row': row, 'errors': errors}, default=str) + '\n')
+        finally:
+            if rejects:
+                rejects.close()
+        if self.checkpoint:
+            self.checkpoint.clear()
+        return report
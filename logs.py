@@ -0,0 +1,119 @@
+import atexit
+import json
+import logging
+import queue
+import random
+import time
+from logging import FileHandler, Formatter
+from logging.handlers import QueueHandler, QueueListener
+from flask import g, request
+
+#----------------------------------------------------------------------------#
+# Logging.
+#
+# Request threads only put records on a queue; a QueueListener thread does
+# the formatting and file I/O. Views log their payloads at DEBUG with lazy
+# %-style arguments, so nothing is formatted unless DEBUG is enabled.
+# One line per request goes to the 'fyyur.request' logger, sampled at
+# REQUEST_LOG_SAMPLE_RATE; errors and slow requests are always kept.
+#----------------------------------------------------------------------------#
+
+_listeners = []
+
+
+class JsonFormatter(Formatter):
+    """One JSON object per line; fields passed via extra={'fields': {...}} are merged in."""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of INFO-and-below records; warnings and errors always pass."""
+
+    def __init__(self, rate):
+        super(SamplingFilter, self).__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+def queued(logger, *handlers):
+    # route logger through a queue drained by a background listener thread
+    q = queue.SimpleQueue()
+    listener = QueueListener(q, *handlers, respect_handler_level=True)
+    listener.start()
+    _listeners.append(listener)
+    logger.addHandler(QueueHandler(q))
+    return listener
+
+
+def stop_listeners():
+    while _listeners:
+        _listeners.pop().stop()
+
+
+def log_requests(app):
+    request_logger = logging.getLogger('fyyur.request')
+    slow_ms = app.config.get('REQUEST_LOG_SLOW_MS', 500)
+
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def log_request(response):
+        if 'request_started' not in g:
+            return response
+        duration = (time.perf_counter() - g.request_started) * 1000.0
+        level = logging.WARNING if response.status_code >= 500 or duration >= slow_ms else logging.INFO
+        if request_logger.isEnabledFor(level):
+            request_logger.log(level, '%s %s %s', request.method, request.path, response.status_code,
+                               extra={'fields': {'method': request.method, 'path': request.path,
+                                                 'status': response.status_code,
+                                                 'duration_ms': round(duration, 3)}})
+        return response
+
+
+def configure_logging(app):
+    json_formatter = JsonFormatter()
+
+    # slow queries and N+1 reports from the query profiler
+    sql_handler = FileHandler(app.config['SQL_SLOW_QUERY_LOG'])
+    sql_handler.setFormatter(Formatter('%(message)s'))
+    sql_logger = logging.getLogger('fyyur.sql')
+    sql_logger.setLevel(logging.INFO)
+    sql_logger.propagate = False
+    queued(sql_logger, sql_handler)
+
+    # sampled access log
+    request_handler = FileHandler(app.config['REQUEST_LOG'])
+    request_handler.setFormatter(json_formatter)
+    request_logger = logging.getLogger('fyyur.request')
+    request_logger.setLevel(logging.INFO)
+    request_logger.propagate = False
+    request_logger.addFilter(SamplingFilter(app.config.get('REQUEST_LOG_SAMPLE_RATE', 1.0)))
+    queued(request_logger, request_handler)
+    log_requests(app)
+
+    if not app.debug:
+        file_handler = FileHandler('error.log')
+        file_handler.setFormatter(
+            Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+        )
+        app.logger.setLevel(logging.INFO)
+        file_handler.setLevel(logging.INFO)
+        queued(app.logger, file_handler)
+        app.logger.info('errors')
+
+    atexit.register(stop_listeners)
@@ -0,0 +1,30 @@
+"""show indexes
+
+Revision ID: 4444
+Revises: 3333
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4444'
+down_revision = '3333'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # per-venue / per-artist lookups filter on the fk plus a start_time range
+    op.create_index('ix_shows_venue_id_start_time', 'shows', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_shows_artist_id_start_time', 'shows', ['artist_id', 'start_time'], unique=False)
+    # /shows listing orders and filters on start_time alone
+    op.create_index(op.f('ix_shows_start_time'), 'shows', ['start_time'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_shows_start_time'), table_name='shows')
+    op.drop_index('ix_shows_artist_id_start_time', table_name='shows')
+    op.drop_index('ix_shows_venue_id_start_time', table_name='shows')
@@ -0,0 +1,39 @@
+"""show counters
+
+Revision ID: 6666
+Revises: 5555
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6666'
+down_revision = '5555'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table, key in (('venues', 'venue_id'), ('artists', 'artist_id')):
+        op.add_column(table, sa.Column('show_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('upcoming_show_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('next_show_time', sa.DateTime(), nullable=True))
+        # backfill from existing shows
+        op.execute(
+            "UPDATE {table} SET "
+            "show_count = (SELECT count(*) FROM shows WHERE shows.{key} = {table}.id), "
+            "upcoming_show_count = (SELECT count(*) FROM shows WHERE shows.{key} = {table}.id "
+            "AND shows.start_time >= LOCALTIMESTAMP), "
+            "next_show_time = (SELECT min(start_time) FROM shows WHERE shows.{key} = {table}.id "
+            "AND shows.start_time >= LOCALTIMESTAMP)".format(table=table, key=key)
+        )
+
+
+def downgrade():
+    for table in ('artists', 'venues'):
+        op.drop_column(table, 'next_show_time')
+        op.drop_column(table, 'upcoming_show_count')
+        op.drop_column(table, 'show_count')
@@ -0,0 +1,28 @@
+"""genre GIN indexes
+
+Revision ID: 8888
+Revises: 7777
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8888'
+down_revision = '7777'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # GIN indexes on the genre arrays answer genres && ARRAY[...] (any of)
+    # and genres @> ARRAY[...] (all of)
+    op.create_index('ix_venues_genres', 'venues', ['genres'], unique=False, postgresql_using='gin')
+    op.create_index('ix_artists_genres', 'artists', ['genres'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('ix_artists_genres', table_name='artists')
+    op.drop_index('ix_venues_genres', table_name='venues')
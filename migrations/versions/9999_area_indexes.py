@@ -0,0 +1,27 @@
+"""state/city indexes
+
+Revision ID: 9999
+Revises: 8888
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9999'
+down_revision = '8888'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # state, city equality filters; name is the keyset order of the listings
+    op.create_index('ix_venues_state_city_name', 'venues', ['state', 'city', 'name'], unique=False)
+    op.create_index('ix_artists_state_city_name', 'artists', ['state', 'city', 'name'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_artists_state_city_name', table_name='artists')
+    op.drop_index('ix_venues_state_city_name', table_name='venues')
@@ -0,0 +1,35 @@
+"""show end times and overlap exclusion constraints
+
+Revision ID: aaaa
+Revises: 9999
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'aaaa'
+down_revision = '9999'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('shows', sa.Column('end_time', sa.DateTime(), nullable=True))
+    # existing shows get the default duration (SHOW_DEFAULT_DURATION_MINUTES)
+    op.execute("UPDATE shows SET end_time = start_time + interval '180 minutes' WHERE start_time IS NOT NULL")
+    # btree_gist lets the GiST index combine = on ids with && on time ranges;
+    # overlapping shows already in the table have to be resolved first
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    op.execute("ALTER TABLE shows ADD CONSTRAINT ex_shows_venue_overlap "
+               "EXCLUDE USING gist (venue_id WITH =, tsrange(start_time, end_time) WITH &&)")
+    op.execute("ALTER TABLE shows ADD CONSTRAINT ex_shows_artist_overlap "
+               "EXCLUDE USING gist (artist_id WITH =, tsrange(start_time, end_time) WITH &&)")
+
+
+def downgrade():
+    op.drop_constraint('ex_shows_artist_overlap', 'shows')
+    op.drop_constraint('ex_shows_venue_overlap', 'shows')
+    op.drop_column('shows', 'end_time')
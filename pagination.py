@@ -0,0 +1,88 @@
+import base64
+import json
+from collections import namedtuple
+from datetime import datetime
+from sqlalchemy import tuple_
+
+#----------------------------------------------------------------------------#
+# Keyset pagination.
+#
+# Pages are addressed by the sort key of the row at their edge instead of an
+# OFFSET, so fetching page 1000 costs the same index range scan as page 1.
+# Cursors are opaque url-safe strings wrapping the JSON-encoded key.
+#----------------------------------------------------------------------------#
+
+Page = namedtuple('Page', ['items', 'next_cursor', 'prev_cursor'])
+
+
+def encode_cursor(values):
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values],
+                     separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    """Key values for columns, or None when the cursor is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw.decode('utf-8'))
+        if not isinstance(values, list) or len(values) != len(columns):
+            return None
+        return [datetime.fromisoformat(v) if _is_datetime(c) else v
+                for c, v in zip(columns, values)]
+    except (ValueError, TypeError):
+        return None
+
+
+def _is_datetime(column):
+    try:
+        return column.type.python_type is datetime
+    except NotImplementedError:
+        return False
+
+
+def page_size(requested, default, maximum):
+    try:
+        size = int(requested)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, maximum))
+
+
+def keyset_page(query, columns, after=None, before=None, limit=50):
+    """One page of query ordered by columns (the last one must be unique).
+
+    after/before are cursors from a previous Page; with neither, or when the
+    cursor points past either end, the first page is returned. Rows must expose
+    each key column under its own name.
+    """
+    key = lambda row: [getattr(row, c.key) for c in columns]
+    query = query.order_by(None)
+    after_key = decode_cursor(after, columns)
+    before_key = decode_cursor(before, columns) if after_key is None else None
+
+    if before_key is not None:
+        rows = query.filter(tuple_(*columns) < tuple(before_key))\
+                    .order_by(*[c.desc() for c in columns])\
+                    .limit(limit + 1)\
+                    .all()
+        if not rows:
+            return keyset_page(query, columns, limit=limit)
+        has_more = len(rows) > limit
+        rows = rows[:limit][::-1]
+        prev_cursor = encode_cursor(key(rows[0])) if has_more else None
+        return Page(rows, encode_cursor(key(rows[-1])), prev_cursor)
+
+    page_query = query
+    if after_key is not None:
+        page_query = query.filter(tuple_(*columns) > tuple(after_key))
+    rows = page_query.order_by(*columns).limit(limit + 1).all()
+    if not rows and after_key is not None:
+        return keyset_page(query, columns, limit=limit)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(key(rows[-1])) if has_more else None
+    prev_cursor = encode_cursor(key(rows[0])) if after_key is not None else None
+    return Page(rows, next_cursor, prev_cursor)
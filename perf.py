@@ -0,0 +1,326 @@
+import contextlib
+import logging
+import random
+import tempfile
+from datetime import date, datetime, time, timedelta
+from urllib.parse import urlencode
+import babel.dates
+import click
+import dateutil.parser
+from flask import render_template
+import benchmark
+from cache import NullCache
+import importer
+import seed_data
+from app import (app, db, Venue, Artist, Show, DATETIME_FORMATS, IMPORT_COLUMNS, area_facets, artist_show_row,
+                 entity_detail, format_datetime, fragment_cache, group_venues_by_area, name_search, refresh_show_counters,
+                 response_cache, show_conflicts, show_count_per_artist, show_count_per_venue, shows_per_day,
+                 venue_show_row, venues_with_upcoming_counts)
+
+#----------------------------------------------------------------------------#
+# Performance commands.
+#
+#   flask --app perf seed-synthetic --create
+#   flask --app perf bench
+#   flask --app perf bench-filter --shows 100000
+#   flask --app perf bench-render --sizes 10,50,200,1000
+#   flask --app perf bench-logging --requests 100
+#   flask --app perf loadtest --requests 200 --concurrency 8
+#
+# They register on the app's CLI when this module is imported, so the app
+# itself never loads the generator or the benchmark helpers.
+#----------------------------------------------------------------------------#
+
+
+@app.cli.command('seed-synthetic')
+@click.option('--venues', default=1000, show_default=True)
+@click.option('--artists', default=3000, show_default=True)
+@click.option('--shows', default=50000, show_default=True)
+@click.option('--seed', default=0, show_default=True, help='The same seed generates the same data.')
+@click.option('--chunk-size', default=5000, show_default=True, help='Rows loaded and committed together.')
+@click.option('--create', is_flag=True, help='Create missing tables first, e.g. in a new SQLite file.')
+def seed_synthetic(venues, artists, shows, seed, chunk_size, create):
+    """Add generated venues, artists and shows (seed_data.generate) for benchmarks.
+
+    Rows are appended to what is already there; run it against a database
+    nothing else is writing to.
+    """
+    if create:
+        db.create_all()
+    started = datetime.now()
+    venue_rows, artist_rows, show_rows = seed_data.generate(venues, artists, shows, seed)
+    ids = {}
+    for model, rows in ((Venue, venue_rows), (Artist, artist_rows)):
+        # new rows take ids above the current maximum, in insertion order
+        before = db.session.query(db.func.coalesce(db.func.max(model.id), 0)).scalar()
+        for chunk in importer.chunked(rows, chunk_size):
+            importer.load_chunk(db.session, model.__table__, list(rows[0]), chunk)
+        ids[model] = [id for id, in db.session.query(model.id).filter(model.id > before).order_by(model.id)]
+        db.session.commit()
+    duration = timedelta(minutes=app.config['SHOW_DEFAULT_DURATION_MINUTES'])
+    for chunk in importer.chunked(show_rows, chunk_size):
+        importer.load_chunk(db.session, Show.__table__, IMPORT_COLUMNS['shows'], [
+            dict(s, venue_id=ids[Venue][s['venue_index']], artist_id=ids[Artist][s['artist_index']],
+                 end_time=s['start_time'] + duration) for s in chunk])
+        db.session.commit()
+    refresh_show_counters(Venue, ids[Venue])
+    refresh_show_counters(Artist, ids[Artist])
+    db.session.commit()
+    for model in (Venue, Artist):
+        name_search(model).invalidate()
+    response_cache.invalidate('venues', 'artists', 'shows')
+    click.echo('{} venues, {} artists, {} shows loaded in {:.1f}s'.format(
+        len(venue_rows), len(artist_rows), len(show_rows), (datetime.now() - started).total_seconds()))
+
+
+def bench_ids(model, sample):
+    # a fixed random sample of ids, so busy and quiet rows both get measured
+    ids = [id for id, in db.session.query(model.id).order_by(model.id)]
+    return random.Random(0).sample(ids, min(sample, len(ids)))
+
+
+def bench_terms(model, ids):
+    # one word of each sampled name, as a partial search term
+    names = db.session.query(model.name).filter(model.id.in_(ids))
+    return [name.split()[1] if len(name.split()) > 1 else name for name, in names]
+
+
+@app.cli.command('bench')
+@click.option('--repeat', default=200, show_default=True, help='Timed calls per helper.')
+@click.option('--sample', default=50, show_default=True, help='Venue/artist ids the calls cycle through.')
+def bench(repeat, sample):
+    """Time the query helpers behind the pages against the configured database."""
+    venue_ids, artist_ids = bench_ids(Venue, sample), bench_ids(Artist, sample)
+    venue_terms, artist_terms = bench_terms(Venue, venue_ids), bench_terms(Artist, artist_ids)
+    month = date.today().replace(day=1)
+    slot = datetime.combine(date.today() + timedelta(days=7), time(20, 0))
+    limit = app.config['SEARCH_LIMIT']
+    cases = [
+        ('show_count_per_venue', show_count_per_venue, [(i,) for i in venue_ids]),
+        ('show_count_per_artist', show_count_per_artist, [(i,) for i in artist_ids]),
+        ('venue detail', lambda id: entity_detail(Venue, id, venue_show_row), [(i,) for i in venue_ids]),
+        ('artist detail', lambda id: entity_detail(Artist, id, artist_show_row), [(i,) for i in artist_ids]),
+        ('venue search', lambda term: name_search(Venue).search(term, limit), [(t,) for t in venue_terms]),
+        ('artist search', lambda term: name_search(Artist).search(term, limit), [(t,) for t in artist_terms]),
+        ('venues by area', lambda: group_venues_by_area(venues_with_upcoming_counts()), None),
+        ('area_facets', area_facets, None),
+        ('shows_per_day (month)', lambda: shows_per_day(start=datetime.combine(month, time()),
+                                                        end=datetime.combine(month + timedelta(days=31), time())), None),
+        ('show_conflicts', lambda v, a: show_conflicts(v, a, slot, slot + timedelta(hours=3)),
+         list(zip(venue_ids, artist_ids))),
+    ]
+    # entity_detail caps the cache lifetime of the response being rendered
+    with app.test_request_context():
+        results = [benchmark.time_calls(name, fn, args, repeat=repeat, after=db.session.remove)
+                   for name, fn, args in cases]
+    click.echo(benchmark.table(results))
+
+
+def schedule_times(n, distinct=False, seed=0):
+    # n show start times: evening half-hour slots over a year, so values
+    # repeat the way a real schedule does, or n different minutes
+    if distinct:
+        return [datetime(2030, 1, 1, 18) + timedelta(minutes=i) for i in range(n)]
+    rng = random.Random(seed)
+    slots = [time(hour, minute) for hour in range(18, 23) for minute in (0, 30)]
+    return [datetime.combine(date(2030, 1, 1) + timedelta(days=rng.randrange(365)), rng.choice(slots))
+            for _ in range(n)]
+
+
+def unmemoized_format_datetime(value, format='medium'):
+    # the filter before it was memoized: reparse, rebuild the Babel pattern
+    return babel.dates.format_datetime(dateutil.parser.parse(value), DATETIME_FORMATS.get(format, format))
+
+
+@app.cli.command('bench-filter')
+@click.option('--shows', default=100000, show_default=True, help='Start times formatted per case.')
+def bench_filter(shows):
+    """Time the datetime template filter over a listing's worth of start times."""
+    repeated, distinct = schedule_times(shows), schedule_times(shows, distinct=True)
+    strings = [t.isoformat() for t in repeated]
+    cases = [
+        ('str, unmemoized (dateutil + babel)', unmemoized_format_datetime, [(s, 'full') for s in strings]),
+        ('str, schedule repeats', format_datetime, [(s, 'full') for s in strings]),
+        ('datetime, schedule repeats', format_datetime, [(t, 'full') for t in repeated]),
+        ('datetime, all distinct', format_datetime, [(t, 'full') for t in distinct]),
+    ]
+    results = []
+    for name, fn, args in cases:
+        format_datetime.cache_clear()
+        results.append(benchmark.time_calls(name, fn, args, repeat=shows, warmup=0))
+    click.echo(benchmark.table(results))
+
+
+def render_shows(n):
+    # show tiles for pages/shows.html, shaped like the /shows view's rows
+    return [{'id': i, 'venue_id': i % 100, 'venue_name': 'Venue {}'.format(i % 100), 'artist_id': i % 300,
+             'artist_name': 'Artist {}'.format(i % 300), 'artist_image_link': 'https://example.com/{}.jpg'.format(i),
+             'start_time': t} for i, t in enumerate(schedule_times(n))]
+
+
+@contextlib.contextmanager
+def jinja_caches(bytecode=True, fragments=False):
+    # the app's Jinja environment with its bytecode and fragment caches
+    # switched on or off for the duration of the block
+    env = app.jinja_env
+    saved = env.bytecode_cache, env.fragment_cache
+    env.bytecode_cache = saved[0] if bytecode else None
+    env.fragment_cache = fragment_cache if fragments else None
+    try:
+        yield env
+    finally:
+        env.bytecode_cache, env.fragment_cache = saved
+
+
+@app.cli.command('bench-render')
+@click.option('--sizes', default='10,50,200,1000', show_default=True, help='Shows per page, comma separated.')
+@click.option('--repeat', default=50, show_default=True, help='Timed renders per case.')
+def bench_render(sizes, repeat):
+    """Time pages/shows.html renders: cold, cold with bytecode, warm and fragment cached.
+
+    Cold renders empty the environment's template cache first, so the
+    template is compiled again, or loaded from the bytecode cache.
+    """
+    cases = [('cold compile', False, False, True), ('warm', True, False, False),
+             ('fragments', True, True, False)]
+    if app.jinja_env.bytecode_cache is not None:
+        cases.insert(1, ('cold + bytecode', True, False, True))
+    results = []
+    with app.test_request_context():
+        for n in [int(size) for size in sizes.split(',')]:
+            shows = render_shows(n)
+            for name, bytecode, fragments, cold in cases:
+                with jinja_caches(bytecode, fragments) as env:
+                    render = lambda: render_template('pages/shows.html', shows=shows, page=None)
+                    results.append(benchmark.time_calls('{} shows, {}'.format(n, name), render, None, repeat=repeat,
+                                                        after=env.cache.clear if cold else None))
+    click.echo(benchmark.table(results))
+
+
+@contextlib.contextmanager
+def uncached():
+    # page and fragment caches off for the duration of the block
+    saved = response_cache.backend, fragment_cache.backend
+    response_cache.backend = fragment_cache.backend = NullCache()
+    try:
+        yield
+    finally:
+        response_cache.backend, fragment_cache.backend = saved
+
+
+@contextlib.contextmanager
+def payload_logging(synchronous):
+    # app.logger as configured (payload dumps at DEBUG, not formatted), or
+    # with every payload formatted and written to a file on the request
+    # thread, the way the print() calls it replaced did
+    logger = app.logger
+    level = logger.level
+    if not synchronous:
+        logger.setLevel(logging.INFO)
+        try:
+            yield
+        finally:
+            logger.setLevel(level)
+        return
+    # only to the file: not also to Flask's stderr handler in debug mode
+    handlers = logger.handlers[:]
+    with tempfile.TemporaryFile('w') as out:
+        logger.handlers[:] = [logging.StreamHandler(out)]
+        logger.setLevel(logging.DEBUG)
+        try:
+            yield
+        finally:
+            logger.handlers[:] = handlers
+            logger.setLevel(level)
+
+
+@app.cli.command('bench-logging')
+@click.option('--requests', 'count', default=100, show_default=True, help='Requests per route and mode.')
+@click.option('--limit', default=200, show_default=True, help='Page size of the listing routes.')
+def bench_logging(count, limit):
+    """Per-request cost of payload logging: as configured vs written synchronously.
+
+    Pages are rendered uncached, through the test client.
+    """
+    venue_id, = bench_ids(Venue, 1)
+    paths = ['/shows?limit={}'.format(limit), '/venues?limit={}'.format(limit),
+             '/artists?limit={}'.format(limit), '/venues/{}'.format(venue_id)]
+    client = app.test_client()
+    results = []
+    with uncached():
+        for path in paths:
+            for name, synchronous in (('queued, DEBUG off', False), ('synchronous payload dump', True)):
+                with payload_logging(synchronous):
+                    results.append(benchmark.time_calls('{} {}'.format(path, name), client.get, [(path,)],
+                                                        repeat=count))
+    click.echo(benchmark.table(results))
+
+
+def load_test_routes(sample):
+    # (name, paths, form) for every read route; writes (create, edit, delete)
+    # are left out so runs can be repeated on the same data
+    venue_ids, artist_ids = bench_ids(Venue, sample), bench_ids(Artist, sample)
+    venue_term, artist_term = bench_terms(Venue, venue_ids[:1]) + [''], bench_terms(Artist, artist_ids[:1]) + ['']
+    states = sorted({s for s, in db.session.query(Venue.state).distinct()})[:sample] or ['']
+    routes = [
+        ('GET /', ['/'], None),
+        ('GET /venues', ['/venues'], None),
+        ('GET /venues?state=', ['/venues?' + urlencode({'state': s}) for s in states], None),
+        ('GET /venues/<id>', ['/venues/{}'.format(i) for i in venue_ids], None),
+        ('GET /venues/<id>/edit', ['/venues/{}/edit'.format(i) for i in venue_ids], None),
+        ('GET /venues/create', ['/venues/create'], None),
+        ('POST /venues/search', ['/venues/search'], {'search_term': venue_term[0]}),
+        ('GET /artists', ['/artists'], None),
+        ('GET /artists/<id>', ['/artists/{}'.format(i) for i in artist_ids], None),
+        ('GET /artists/<id>/edit', ['/artists/{}/edit'.format(i) for i in artist_ids], None),
+        ('GET /artists/create', ['/artists/create'], None),
+        ('POST /artists/search', ['/artists/search'], {'search_term': artist_term[0]}),
+        ('GET /shows', ['/shows'], None),
+        ('GET /shows/calendar', ['/shows/calendar'], None),
+        ('GET /shows/create', ['/shows/create'], None),
+        ('GET /api/v1/venues', ['/api/v1/venues'], None),
+        ('GET /api/v1/venues/<id>', ['/api/v1/venues/{}'.format(i) for i in venue_ids], None),
+        ('GET /api/v1/venues/search', ['/api/v1/venues/search?' + urlencode({'q': venue_term[0]})], None),
+        ('GET /api/v1/venues/genres', ['/api/v1/venues/genres'], None),
+        ('GET /api/v1/artists', ['/api/v1/artists'], None),
+        ('GET /api/v1/artists/<id>', ['/api/v1/artists/{}'.format(i) for i in artist_ids], None),
+        ('GET /api/v1/artists/search', ['/api/v1/artists/search?' + urlencode({'q': artist_term[0]})], None),
+        ('GET /api/v1/artists/genres', ['/api/v1/artists/genres'], None),
+        ('GET /api/v1/areas', ['/api/v1/areas'], None),
+        ('GET /api/v1/shows', ['/api/v1/shows'], None),
+        ('GET /api/v1/shows/calendar', ['/api/v1/shows/calendar'], None),
+        ('GET /api/v1/export/venues', ['/api/v1/export/venues'], None),
+        ('GET /metrics', ['/metrics'], None),
+    ]
+    routes += [
+        ('GET /venues?genre=', ['/venues?' + urlencode({'genre': g}) for g in seed_data.GENRES], None),
+        ('GET /api/v1/artists?genre=', ['/api/v1/artists?' + urlencode({'genre': g}) for g in seed_data.GENRES], None),
+    ]
+    return routes
+
+
+@app.cli.command('loadtest')
+@click.option('--url', help='Base url of a running server; by default the app is served from a local thread.')
+@click.option('--requests', 'count', default=200, show_default=True, help='Requests per route.')
+@click.option('--concurrency', default=8, show_default=True, help='Client threads.')
+@click.option('--sample', default=50, show_default=True, help='Venue/artist ids the detail routes cycle through.')
+@click.option('--route', 'only', multiple=True, help='Only routes whose name contains this; repeatable.')
+@click.option('--server', type=click.Choice(['wsgi', 'asgi']), default='wsgi', show_default=True,
+              help='Serve app on werkzeug, or asgi.py on uvicorn.')
+def loadtest(url, count, concurrency, sample, only, server):
+    """p50/p95/p99 latency and requests/sec of every read route.
+
+    Set CACHE_BACKEND=null to measure uncached rendering.
+    """
+    routes = [r for r in load_test_routes(sample) if not only or any(o in r[0] for o in only)]
+    db.session.remove()
+    if url:
+        server = contextlib.nullcontext(url.rstrip('/'))
+    elif server == 'asgi':
+        import asgi
+        server = benchmark.serve_asgi(asgi.application)
+    else:
+        server = benchmark.serve(app)
+    with server as base_url:
+        results = [benchmark.load(name, base_url, paths, count, concurrency, form) for name, paths, form in routes]
+    click.echo(benchmark.table(results))
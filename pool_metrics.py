@@ -0,0 +1,124 @@
+import threading
+import time
+from sqlalchemy import event, exc
+
+#----------------------------------------------------------------------------#
+# Connection pool telemetry.
+#
+# Pool events keep running counters of connects, checkouts, checkins and
+# checkouts served from overflow; the pool's connect() is timed so checkout
+# waits (queueing for a free connection, pre-ping and new connects included)
+# show up as a latency histogram.
+#----------------------------------------------------------------------------#
+
+# upper bounds in milliseconds
+LATENCY_BUCKETS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+class PoolMetrics(object):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pool = None
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.overflow_checkouts = 0
+        self.checkout_timeouts = 0
+        self.in_use_peak = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.wait_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def install(self, engine):
+        # pool events registered on the engine carry over when dispose()
+        # replaces the pool; the connect() timer has to be re-applied
+        event.listen(engine, 'connect', self._on_connect)
+        event.listen(engine, 'checkout', self._on_checkout)
+        event.listen(engine, 'checkin', self._on_checkin)
+        event.listen(engine, 'invalidate', self._on_invalidate)
+        event.listen(engine, 'engine_disposed', lambda engine: self._time_connect(engine.pool))
+        self._time_connect(engine.pool)
+
+    def _time_connect(self, pool):
+        self.pool = pool
+        connect = pool.connect
+
+        def timed_connect():
+            start = time.perf_counter()
+            try:
+                return connect()
+            except exc.TimeoutError:
+                with self._lock:
+                    self.checkout_timeouts += 1
+                raise
+            finally:
+                self._record_wait(time.perf_counter() - start)
+
+        pool.connect = timed_connect
+
+    def _record_wait(self, seconds):
+        ms = seconds * 1000.0
+        with self._lock:
+            self.wait_count += 1
+            self.wait_total += ms
+            self.wait_max = max(self.wait_max, ms)
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if ms <= bound:
+                    self.wait_buckets[i] += 1
+                    break
+            else:
+                self.wait_buckets[-1] += 1
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+            if _call(self.pool, 'overflow', 0) > 0:
+                self.overflow_checkouts += 1
+            self.in_use_peak = max(self.in_use_peak, self.checkouts - self.checkins)
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.checkins += 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def snapshot(self):
+        pool = self.pool
+        with self._lock:
+            buckets = dict(zip(['le_{}ms'.format(b) for b in LATENCY_BUCKETS] + ['gt_{}ms'.format(LATENCY_BUCKETS[-1])],
+                               self.wait_buckets))
+            return {
+                'pool_class': type(pool).__name__ if pool is not None else None,
+                'size': _call(pool, 'size'),
+                'in_use': self.checkouts - self.checkins,
+                'idle': _call(pool, 'checkedin'),
+                'overflow': _call(pool, 'overflow'),
+                'in_use_peak': self.in_use_peak,
+                'connects': self.connects,
+                'checkouts': self.checkouts,
+                'checkins': self.checkins,
+                'invalidations': self.invalidations,
+                'overflow_checkouts': self.overflow_checkouts,
+                'checkout_timeouts': self.checkout_timeouts,
+                'checkout_wait_ms': {
+                    'count': self.wait_count,
+                    'avg': (self.wait_total / self.wait_count) if self.wait_count else None,
+                    'max': self.wait_max,
+                    'buckets': buckets,
+                },
+            }
+
+
+def _call(pool, method, default=None):
+    # QueuePool reports size/overflow/checkedout; other pool classes may not
+    fn = getattr(pool, method, None)
+    return fn() if fn is not None else default
@@ -0,0 +1,109 @@
+import json
+import logging
+import time
+from collections import Counter
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+#----------------------------------------------------------------------------#
+# Per-request SQL profiling.
+#
+# Cursor events count statements and DB time for the request being served;
+# with SQL_SERVER_TIMING (on in debug) the totals go out in a Server-Timing
+# header. Statements slower than SQL_SLOW_QUERY_MS are written to the
+# 'fyyur.sql' logger as JSON together with their parameters and query plan,
+# and with SQL_DETECT_NPLUS1 on, a statement repeated more than
+# SQL_NPLUS1_THRESHOLD times in one request is reported as a likely N+1.
+#----------------------------------------------------------------------------#
+
+logger = logging.getLogger('fyyur.sql')
+
+
+class QueryProfiler(object):
+
+    def __init__(self, slow_query_ms=100, explain=True, detect_nplus1=False, nplus1_threshold=5,
+                 server_timing=False):
+        self.slow_query_ms = slow_query_ms
+        self.explain = explain
+        self.detect_nplus1 = detect_nplus1
+        self.nplus1_threshold = nplus1_threshold
+        self.server_timing = server_timing
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(slow_query_ms=config.get('SQL_SLOW_QUERY_MS', 100),
+                   explain=config.get('SQL_EXPLAIN_SLOW_QUERIES', True),
+                   detect_nplus1=config.get('SQL_DETECT_NPLUS1', config.get('DEBUG', False)),
+                   nplus1_threshold=config.get('SQL_NPLUS1_THRESHOLD', 5),
+                   server_timing=config.get('SQL_SERVER_TIMING', config.get('DEBUG', False)))
+
+    def install(self, app, engine):
+        self.watch(engine)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+    def watch(self, engine):
+        # count and time the statements of another engine too (e.g. the sync
+        # side of an async engine)
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def _start_request(self):
+        g.sql_started = time.perf_counter()
+        g.sql_count = 0
+        g.sql_time = 0.0
+        g.sql_statements = Counter()
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = (time.perf_counter() - conn.info['query_start'].pop()) * 1000.0
+        if conn.info.get('explaining'):
+            return
+        if has_request_context() and 'sql_count' in g:
+            g.sql_count += 1
+            g.sql_time += elapsed
+            g.sql_statements[statement] += 1
+        if elapsed >= self.slow_query_ms:
+            self._log_slow_query(conn, statement, parameters, executemany, elapsed)
+
+    def _log_slow_query(self, conn, statement, parameters, executemany, elapsed):
+        record = {
+            'event': 'slow_query',
+            'path': request.path if has_request_context() else None,
+            'duration_ms': round(elapsed, 3),
+            'statement': statement,
+            'parameters': parameters,
+        }
+        if self.explain and not executemany and statement.lstrip()[:6].upper() == 'SELECT':
+            record['plan'] = self._explain(conn, statement, parameters)
+        logger.warning(json.dumps(record, default=str))
+
+    def _explain(self, conn, statement, parameters):
+        prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+        conn.info['explaining'] = True
+        try:
+            return [list(row) for row in conn.exec_driver_sql(prefix + statement, parameters)]
+        except Exception as e:
+            return 'explain failed: {}'.format(e)
+        finally:
+            conn.info['explaining'] = False
+
+    def _finish_request(self, response):
+        if 'sql_count' not in g:
+            return response
+        if self.server_timing:
+            total = (time.perf_counter() - g.sql_started) * 1000.0
+            response.headers.add('Server-Timing', 'db;dur={:.2f};desc="{} queries"'.format(g.sql_time, g.sql_count))
+            response.headers.add('Server-Timing', 'app;dur={:.2f}'.format(total))
+        if self.detect_nplus1:
+            for statement, count in g.sql_statements.items():
+                if count > self.nplus1_threshold:
+                    logger.warning(json.dumps({
+                        'event': 'n_plus_one',
+                        'path': request.path,
+                        'count': count,
+                        'statement': statement,
+                    }))
+        return response
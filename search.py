@@ -0,0 +1,152 @@
+import re
+import threading
+from collections import defaultdict
+from sqlalchemy import func
+
+#----------------------------------------------------------------------------#
+# Name search.
+#
+# Case-insensitive partial matching on a name column ("Hop" finds
+# "The Musical Hop"), ranked by trigram similarity. Postgres answers it with
+# ILIKE backed by a pg_trgm GIN index (see migration 5555); other databases
+# (SQLite test runs) use an in-process TrigramIndex over (id, name) pairs.
+#----------------------------------------------------------------------------#
+
+_words = re.compile(r'\w+')
+
+
+def escape_like(term, escape='\\'):
+    return term.replace(escape, escape * 2).replace('%', escape + '%').replace('_', escape + '_')
+
+
+def substring_trigrams(text):
+    # raw 3-grams of the whole string; every substring match of a term of
+    # three or more characters shares all of the term's substring trigrams
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def word_trigrams(text):
+    # pg_trgm style trigrams: each word padded with two leading blanks and one
+    # trailing blank
+    grams = set()
+    for word in _words.findall(text):
+        padded = '  ' + word + ' '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(a, b):
+    # same measure as pg_trgm's similarity(): shared trigrams over all trigrams
+    if not a or not b:
+        return 0.0
+    return len(a & b) / float(len(a | b))
+
+
+class TrigramIndex(object):
+    """In-process trigram index over (id, name) pairs."""
+
+    def __init__(self, rows=()):
+        self._lock = threading.Lock()
+        self._names = {}
+        self._postings = defaultdict(set)
+        self._grams = {}
+        for id, name in rows:
+            self.add(id, name)
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, id, name):
+        with self._lock:
+            self._discard(id)
+            folded = name.casefold()
+            self._names[id] = (name, folded)
+            self._grams[id] = word_trigrams(folded)
+            for gram in substring_trigrams(folded):
+                self._postings[gram].add(id)
+
+    def discard(self, id):
+        with self._lock:
+            self._discard(id)
+
+    def _discard(self, id):
+        entry = self._names.pop(id, None)
+        if entry is None:
+            return
+        self._grams.pop(id, None)
+        for gram in substring_trigrams(entry[1]):
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(id)
+                if not ids:
+                    del self._postings[gram]
+
+    def search(self, term, limit=None):
+        """(id, name) pairs whose name contains term, best matches first."""
+        folded = term.casefold()
+        with self._lock:
+            grams = substring_trigrams(folded)
+            if grams:
+                postings = sorted((self._postings.get(g, ()) for g in grams), key=len)
+                candidates = set(postings[0]).intersection(*postings[1:])
+            else:
+                candidates = self._names.keys()
+            matches = [(id, self._names[id][0], self._grams[id]) for id in candidates
+                       if folded in self._names[id][1]]
+        term_grams = word_trigrams(folded)
+        matches.sort(key=lambda m: (-similarity(term_grams, m[2]), m[1], m[0]))
+        return [(id, name) for id, name, _ in matches[:limit]]
+
+
+class PostgresSearch(object):
+    """ILIKE + similarity() ranking; relies on the pg_trgm GIN index."""
+
+    def __init__(self, session, model):
+        self.session = session
+        self.model = model
+
+    def search(self, term, limit=None):
+        model = self.model
+        query = self.session.query(model.id, model.name)\
+                    .filter(model.name.ilike('%{}%'.format(escape_like(term)), escape='\\'))
+        if term:
+            query = query.order_by(func.similarity(model.name, term).desc(), model.name, model.id)
+        else:
+            query = query.order_by(model.name, model.id)
+        if limit is not None:
+            query = query.limit(limit)
+        return [(r.id, r.name) for r in query.all()]
+
+    def invalidate(self):
+        pass
+
+
+class MemorySearch(object):
+    """TrigramIndex loaded lazily from the table and rebuilt after invalidate()."""
+
+    def __init__(self, session, model):
+        self.session = session
+        self.model = model
+        self._index = None
+
+    def search(self, term, limit=None):
+        index = self._index
+        if index is None:
+            index = self._index = TrigramIndex(self.session.query(self.model.id, self.model.name).all())
+        return index.search(term, limit)
+
+    def invalidate(self):
+        self._index = None
+
+
+backends = {
+    'postgres': PostgresSearch,
+    'memory': MemorySearch,
+}
+
+
+def backend_for(name, dialect_name):
+    # 'auto' uses the database when it is Postgres and the in-process index otherwise
+    if name == 'auto':
+        name = 'postgres' if dialect_name == 'postgresql' else 'memory'
+    return backends[name]
@@ -110,4 +110,135 @@ seed_shows = [{
     "artist_name": "The Wild Sax Band",
     "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
     "start_time": "2035-04-15T20:00:00.000Z"
-  }]
\ No newline at end of file
+  }]
+
+#----------------------------------------------------------------------------#
+# Synthetic data.
+#
+# generate() builds any number of venues, artists and shows shaped like the
+# seed rows above, deterministically for a given seed. Cities, genres and
+# show counts follow Zipf-like weights, so a few venues and artists carry
+# most of the shows as in real listings. Shows take 18:00 or 22:00 slots
+# within a year either side of now and never overlap at a venue or for an
+# artist.
+#----------------------------------------------------------------------------#
+
+import random
+from itertools import accumulate
+from datetime import datetime, time, timedelta
+
+CITIES = [
+    ("New York", "NY"), ("Los Angeles", "CA"), ("Chicago", "IL"), ("Houston", "TX"), ("Phoenix", "AZ"),
+    ("Philadelphia", "PA"), ("San Antonio", "TX"), ("San Diego", "CA"), ("Dallas", "TX"), ("San Jose", "CA"),
+    ("Austin", "TX"), ("Jacksonville", "FL"), ("Columbus", "OH"), ("Charlotte", "NC"), ("San Francisco", "CA"),
+    ("Indianapolis", "IN"), ("Seattle", "WA"), ("Denver", "CO"), ("Washington", "DC"), ("Boston", "MA"),
+    ("Nashville", "TN"), ("Detroit", "MI"), ("Portland", "OR"), ("Las Vegas", "NV"), ("Memphis", "TN"),
+    ("Louisville", "KY"), ("Baltimore", "MD"), ("Milwaukee", "WI"), ("Albuquerque", "NM"), ("Atlanta", "GA"),
+    ("Kansas City", "MO"), ("Miami", "FL"), ("Oakland", "CA"), ("Minneapolis", "MN"), ("New Orleans", "LA"),
+    ("Cleveland", "OH"), ("Tampa", "FL"), ("Pittsburgh", "PA"), ("Cincinnati", "OH"), ("Portland", "ME"),
+]
+
+# the genre choices of VenueForm/ArtistForm, most common first
+GENRES = [
+    "Rock n Roll", "Jazz", "Pop", "Hip-Hop", "Alternative", "Folk", "Blues", "Electronic", "R&B", "Country",
+    "Classical", "Soul", "Funk", "Punk", "Reggae", "Heavy Metal", "Instrumental", "Musical Theatre", "Other",
+]
+
+WORDS = [
+    "Blue", "Velvet", "Electric", "Golden", "Midnight", "Silver", "Red", "Wild", "Neon", "Hidden", "Lucky",
+    "Broken", "Crystal", "Rolling", "Paper", "Iron", "Echo", "Northern", "Sunset", "Royal",
+]
+VENUE_NOUNS = ["Room", "Hall", "Lounge", "Theater", "Club", "Tavern", "Garden", "Ballroom", "Cellar", "Stage"]
+ARTIST_NOUNS = ["Band", "Collective", "Trio", "Quartet", "Orchestra", "Project", "Ensemble", "Experience"]
+
+SHOW_SLOTS = (time(18, 0), time(22, 0))
+
+
+def _zipf_weights(n, s=1.1):
+    # cumulative, so random.choices() does not re-add them on every call
+    return list(accumulate(1.0 / (rank ** s) for rank in range(1, n + 1)))
+
+
+GENRE_WEIGHTS = _zipf_weights(len(GENRES), 0.8)
+
+
+def _genres(rng):
+    return sorted(set(rng.choices(GENRES, cum_weights=GENRE_WEIGHTS, k=rng.randint(1, 4))))
+
+
+def generate(venues=100, artists=300, shows=2000, seed=0, now=None):
+    """(venues, artists, shows) lists of dicts shaped like seed_venues, seed_artists and seed_shows.
+
+    Shows reference venues and artists by their position in the returned
+    lists ("venue_index", "artist_index") and carry their names, so a loader
+    can map them to database ids. Fewer shows than requested are returned
+    when the busiest venues and artists run out of free slots.
+    """
+    rng = random.Random(seed)
+    now = now or datetime.now()
+    city_weights = _zipf_weights(len(CITIES))
+
+    venue_rows = []
+    for i in range(venues):
+        city, state = rng.choices(CITIES, cum_weights=city_weights)[0]
+        name = "The {} {} {}".format(rng.choice(WORDS), rng.choice(VENUE_NOUNS), i + 1)
+        venue_rows.append({
+            "name": name,
+            "genres": _genres(rng),
+            "address": "{} {} Street".format(rng.randint(1, 9999), rng.choice(WORDS)),
+            "city": city,
+            "state": state,
+            "phone": "{:03d}-{:03d}-{:04d}".format(rng.randint(200, 999), rng.randint(0, 999), rng.randint(0, 9999)),
+            "website": "https://www.example.com/venues/{}".format(i + 1),
+            "facebook_link": "https://www.facebook.com/venue{}".format(i + 1),
+            "seeking_talent": rng.random() < 0.3,
+            "seeking_description": None,
+            "image_link": "https://picsum.photos/seed/venue{}/400/300".format(i + 1),
+        })
+
+    artist_rows = []
+    for i in range(artists):
+        city, state = rng.choices(CITIES, cum_weights=city_weights)[0]
+        artist_rows.append({
+            "name": "{} {} {}".format(rng.choice(WORDS), rng.choice(ARTIST_NOUNS), i + 1),
+            "genres": _genres(rng),
+            "city": city,
+            "state": state,
+            "phone": "{:03d}-{:03d}-{:04d}".format(rng.randint(200, 999), rng.randint(0, 999), rng.randint(0, 9999)),
+            "website": None,
+            "facebook_link": "https://www.facebook.com/artist{}".format(i + 1),
+            "seeking_venue": rng.random() < 0.4,
+            "seeking_description": None,
+            "image_link": "https://picsum.photos/seed/artist{}/300/300".format(i + 1),
+        })
+
+    # popularity ranks are shuffled so the busiest rows are spread over the ids
+    venue_order = list(range(venues))
+    artist_order = list(range(artists))
+    rng.shuffle(venue_order)
+    rng.shuffle(artist_order)
+    venue_weights = _zipf_weights(venues)
+    artist_weights = _zipf_weights(artists)
+    today = now.date()
+    booked = set()
+    show_rows = []
+    attempts = 0
+    while len(show_rows) < shows and attempts < shows * 20 and venues and artists:
+        attempts += 1
+        v = venue_order[rng.choices(range(venues), cum_weights=venue_weights)[0]]
+        a = artist_order[rng.choices(range(artists), cum_weights=artist_weights)[0]]
+        day = today + timedelta(days=rng.randint(-365, 365))
+        start = datetime.combine(day, rng.choice(SHOW_SLOTS))
+        if ("v", v, start) in booked or ("a", a, start) in booked:
+            continue
+        booked.add(("v", v, start))
+        booked.add(("a", a, start))
+        show_rows.append({
+            "venue_index": v,
+            "venue_name": venue_rows[v]["name"],
+            "artist_index": a,
+            "artist_name": artist_rows[a]["name"],
+            "artist_image_link": artist_rows[a]["image_link"],
+            "start_time": start,
+        })
+    return venue_rows, artist_rows, show_rows
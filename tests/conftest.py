@@ -0,0 +1,141 @@
+import os
+import sys
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+# configure before the app module reads config: a private in-memory database
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ.setdefault('CACHE_BACKEND', 'memory')
+# debug mode, as in development: errors stay out of error.log
+os.environ.setdefault('DEBUG', 'true')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy import create_engine, event
+
+import app as fyyur
+import cache
+import seed_data
+from app import db, Venue, Artist, Show
+
+
+def seed():
+    for row in seed_data.seed_venues:
+        db.session.execute(Venue.__table__.insert().values(**row))
+    for row in seed_data.seed_artists:
+        db.session.execute(Artist.__table__.insert().values(**row))
+    for row in seed_data.seed_shows:
+        start = datetime.fromisoformat(row['start_time'][:19])
+        db.session.execute(Show.__table__.insert().values(dict(row, start_time=start, end_time=start + timedelta(hours=3))))
+    refresh_counters()
+
+
+def refresh_counters():
+    fyyur.refresh_show_counters(Venue)
+    fyyur.refresh_show_counters(Artist)
+    db.session.commit()
+
+
+def add_synthetic(venues, artists, shows, seed=0):
+    """Append seed_data.generate() rows through the ORM; returns the new (venues, artists)."""
+    venue_rows, artist_rows, show_rows = seed_data.generate(venues, artists, shows, seed)
+    new_venues = [Venue(**row) for row in venue_rows]
+    new_artists = [Artist(**row) for row in artist_rows]
+    db.session.add_all(new_venues + new_artists)
+    db.session.flush()
+    for row in show_rows:
+        venue, artist = new_venues[row['venue_index']], new_artists[row['artist_index']]
+        db.session.add(Show(venue_id=venue.id, artist_id=artist.id, venue_name=venue.name, artist_name=artist.name,
+                            artist_image_link=artist.image_link, start_time=row['start_time'],
+                            end_time=row['start_time'] + timedelta(hours=3)))
+    db.session.flush()
+    refresh_counters()
+    return new_venues, new_artists
+
+
+def reset_caches():
+    fyyur.response_cache.invalidate('venues', 'artists', 'shows')
+    fyyur.name_searches.clear()
+
+
+@pytest.fixture
+def app():
+    flask_app = fyyur.app
+    flask_app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    with flask_app.app_context():
+        db.drop_all()
+        db.create_all()
+        seed()
+        reset_caches()
+        yield flask_app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def file_db(app, tmp_path, monkeypatch):
+    """Run the app on a seeded SQLite file instead of the in-memory database; yields its URL.
+
+    For tests that need a real connection pool, or a second connection (the async views).
+    """
+    url = 'sqlite:///{}'.format(tmp_path / 'fyyur.db')
+    engine = create_engine(url)
+    db.session.remove()
+    monkeypatch.setitem(db.engines, None, engine)
+    db.create_all()
+    seed()
+    reset_caches()
+    yield url
+    db.session.remove()
+    engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def statements(app):
+    """SQL statements executed while the test runs, in order."""
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    yield executed
+    event.remove(db.engine, 'before_cursor_execute', record)
+
+
+class Clock(object):
+    """Wall clock of the app and the response cache, moved by hand."""
+
+    def __init__(self, now):
+        self.now = now
+
+    def datetime(self):
+        clock = self
+
+        class FrozenDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return clock.now
+
+        return FrozenDatetime
+
+    def time(self):
+        return self.now.timestamp()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Set clock.now to move datetime.now() in app and cache, and the cache's time.time().
+
+    Only the cache's: the connection pool also reads time.time() to recycle connections.
+    """
+    frozen = Clock(datetime.now())
+    monkeypatch.setattr(fyyur, 'datetime', frozen.datetime())
+    monkeypatch.setattr(cache, 'datetime', frozen.datetime())
+    monkeypatch.setattr(cache, 'time', SimpleNamespace(time=frozen.time))
+    return frozen
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+httpx = pytest.importorskip('httpx')
+pytest.importorskip('aiosqlite')
+pytest.importorskip('greenlet')
+
+import aio
+import app as fyyur
+import asgi
+from tests.conftest import reset_caches
+
+
+@pytest.fixture
+def application(file_db, monkeypatch):
+    """asgi.Application with the sync and async engines on one SQLite file.
+
+    The async views need a file: an in-memory database is private to its connection.
+    """
+    engines = []
+    reads = aio.AsyncReads(file_db, on_engine=engines.append)
+    reads.engines = engines  # not empty once a request has read through the async engine
+    monkeypatch.setattr(fyyur, 'async_reads', reads)
+    return asgi.Application(fyyur.app, fyyur.async_views, reads)
+
+
+def asgi_request(application, method, url, headers=None):
+    async def send():
+        transport = httpx.ASGITransport(app=application)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url='http://localhost') as client:
+                return await client.request(method, url, headers=headers)
+        finally:
+            await application.reads.dispose()
+    return asyncio.run(send())
+
+
+def compare(client, application, method, url, headers=None):
+    # (sync, async) responses, each rendered from an empty response cache
+    reset_caches()
+    sync = client.open(url, method=method, headers=headers)
+    reset_caches()
+    served = asgi_request(application, method, url, headers)
+    assert application.reads.engines, 'served synchronously'
+    return sync, served
+
+
+@pytest.mark.parametrize('url', ['/venues/3', '/api/v1/artists/3', '/api/v1/venues/1?fields=name,past_shows'])
+def test_async_views_match_sync_views(client, application, url):
+    sync, served = compare(client, application, 'GET', url)
+    assert served.status_code == sync.status_code == 200
+    assert served.content == sync.get_data()
+    for header in ('Content-Type', 'ETag', 'Last-Modified'):
+        assert served.headers[header] == sync.headers[header]
+
+
+def test_async_view_not_modified(client, application):
+    etag = client.get('/venues/3').headers['ETag']
+    sync, served = compare(client, application, 'GET', '/venues/3', {'If-None-Match': etag})
+    assert served.status_code == sync.status_code == 304
+    assert served.content == b'' and served.headers['ETag'] == etag
+
+
+def test_async_view_head(client, application):
+    sync, served = compare(client, application, 'HEAD', '/api/v1/artists/3')
+    assert served.status_code == sync.status_code == 200
+    assert served.content == b''
+    assert served.headers['Content-Length'] == sync.headers['Content-Length']
+
+
+@pytest.mark.parametrize('url', ['/venues/999', '/artists/999'])
+def test_async_page_unknown_id(client, application, url):
+    sync, served = compare(client, application, 'GET', url)
+    assert served.status_code == sync.status_code == 404
+    assert served.content == sync.get_data()
+
+
+def test_async_api_unknown_id(client, application):
+    sync, served = compare(client, application, 'GET', '/api/v1/artists/999')
+    assert served.status_code == sync.status_code == 404
+    assert served.json() == sync.get_json() == {'error': 'artist not found'}
+
+
+def test_other_requests_go_through_wsgi(application):
+    response = asgi_request(application, 'GET', '/api/v1/venues?fields=name')
+    assert response.status_code == 200 and len(response.json()['data']) == 3
+    assert not application.reads.engines
+
+
+def test_wsgi_environ():
+    environ = asgi.wsgi_environ({
+        'type': 'http', 'method': 'GET', 'http_version': '1.1', 'root_path': '/fyyur',
+        'path': '/fyyur/venues/3', 'query_string': b'a=1', 'server': ('example.com', 8000),
+        'headers': [(b'content-type', b'text/html'), (b'accept', b'text/html'), (b'accept', b'*/*')],
+    })
+    assert (environ['SCRIPT_NAME'], environ['PATH_INFO'], environ['QUERY_STRING']) == ('/fyyur', '/venues/3', 'a=1')
+    assert (environ['SERVER_NAME'], environ['SERVER_PORT']) == ('example.com', '8000')
+    assert environ['CONTENT_TYPE'] == 'text/html' and environ['HTTP_ACCEPT'] == 'text/html,*/*'
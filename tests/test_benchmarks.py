@@ -0,0 +1,50 @@
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from datetime import datetime, timedelta
+
+import app as fyyur
+from app import db, Venue, Artist
+from tests.conftest import add_synthetic
+
+# Micro-benchmarks of the helpers behind the pages, on a synthetic dataset:
+#   python -m pytest tests/test_benchmarks.py --benchmark-only
+# flask --app perf bench runs the same helpers against a real database.
+
+
+@pytest.fixture
+def dataset(app):
+    venues, artists = add_synthetic(50, 150, 3000)
+    # the detail helpers cap the cache lifetime of the response being rendered
+    with app.test_request_context():
+        yield [v.id for v in venues], [a.id for a in artists]
+
+
+def test_show_count_per_venue(benchmark, dataset):
+    venue_ids, _ = dataset
+    count = benchmark(fyyur.show_count_per_venue, venue_ids[0])
+    assert count == db.session.get(Venue, venue_ids[0]).upcoming_show_count
+
+
+def test_artist_show_list(benchmark, dataset):
+    _, artist_ids = dataset
+    artist = benchmark(fyyur.entity_detail, Artist, artist_ids[0], fyyur.artist_show_row)
+    assert artist['upcoming_shows_count'] + artist['past_shows_count'] == artist['show_count']
+
+
+def test_venue_search(benchmark, dataset):
+    search = fyyur.name_search(Venue)
+    limit = fyyur.app.config['SEARCH_LIMIT']
+    assert benchmark(search.search, 'The', limit)
+
+
+def test_venues_by_area(benchmark, dataset):
+    areas = benchmark(lambda: fyyur.group_venues_by_area(fyyur.venues_with_upcoming_counts()))
+    assert sum(len(a['venues']) for a in areas) == db.session.query(Venue).count()
+
+
+def test_show_conflicts(benchmark, dataset):
+    venue_ids, artist_ids = dataset
+    slot = datetime.combine(datetime.now().date() + timedelta(days=7), datetime.min.time()) + timedelta(hours=20)
+    benchmark(fyyur.show_conflicts, venue_ids[0], artist_ids[0], slot, slot + timedelta(hours=3))
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+import app as fyyur
+import cache
+
+
+@pytest.fixture(autouse=True, params=['memory', 'redis'])
+def backend(request, app, monkeypatch):
+    """Run every test against the in-process LRU and, with fakeredis, RedisCache."""
+    if request.param == 'redis':
+        fakeredis = pytest.importorskip('fakeredis')
+        import fakeredis._socket._base
+        # fakeredis expires keys by its own time.time(); give it the cache's, which the clock fixture moves
+        monkeypatch.setattr(fakeredis._socket._base, 'time', SimpleNamespace(time=lambda: cache.time.time()))
+        backend = cache.RedisCache(fakeredis.FakeRedis(server=fakeredis.FakeServer()))
+    else:
+        backend = cache.LRUCache()
+    monkeypatch.setattr(fyyur.response_cache, 'backend', backend)
+    return backend
+
+
+def test_escaped_args_do_not_share_a_cache_entry(client, statements):
+    client.get('/venues?state=CA%26x%3D1')
+    del statements[:]
+    page = client.get('/venues?state=CA&x=1').get_data(as_text=True)
+    assert statements, 'served from the entry of a different url'
+    assert 'The Musical Hop' in page
+
+
+def test_repeated_request_is_served_from_cache(client, statements):
+    client.get('/venues?state=CA')
+    del statements[:]
+    client.get('/venues?state=CA')
+    assert statements == []
+
+
+def test_failed_render_is_not_cached(client, statements, monkeypatch):
+    def broken(rows):
+        raise RuntimeError('database went away')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(fyyur, 'group_venues_by_area', broken)
+        response = client.get('/venues')
+    assert response.status_code == 200 and 'ETag' not in response.headers
+    del statements[:]
+    page = client.get('/venues').get_data(as_text=True)
+    assert statements and 'The Musical Hop' in page
+
+
+def test_entry_expires_when_its_next_show_starts(client, statements, clock):
+    # Park Square's next show starts at 20:00 on April 1 2035
+    clock.now = datetime(2035, 4, 1, 19, 59)
+    assert '3 Upcoming Shows' in client.get('/venues/3').get_data(as_text=True)
+    clock.now = datetime(2035, 4, 1, 19, 59, 59)
+    del statements[:]
+    client.get('/venues/3')
+    assert statements == []
+    clock.now = datetime(2035, 4, 1, 20, 0, 1)
+    page = client.get('/venues/3').get_data(as_text=True)
+    assert statements, 'served the entry cached before the show started'
+    assert '2 Upcoming Shows' in page and '2 Past Shows' in page
+
+
+def test_invalidate_moves_to_a_new_generation(client, statements, backend):
+    client.get('/venues?state=CA')
+    generation = backend.counter('gen:venues')
+    fyyur.response_cache.invalidate('venues')
+    assert backend.counter('gen:venues') == generation + 1
+    del statements[:]
+    assert 'The Musical Hop' in client.get('/venues?state=CA').get_data(as_text=True)
+    assert statements, 'served the entry of the previous generation'
+
+
+def test_entries_round_trip(backend):
+    entry = (b'<h1>Venues</h1>', 200, [('Content-Type', 'text/html; charset=utf-8'), ('ETag', '"abc"')])
+    backend.set('view:venues0:/venues?', entry, 60)
+    assert backend.get('view:venues0:/venues?') == entry
+    assert backend.get('view:venues1:/venues?') is None
+
+
+def test_entries_expire_after_their_timeout(backend, clock):
+    backend.set('key', 'value', 1.5)
+    clock.now += timedelta(seconds=1)
+    assert backend.get('key') == 'value'
+    clock.now += timedelta(seconds=1)
+    assert backend.get('key') is None
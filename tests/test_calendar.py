@@ -0,0 +1,22 @@
+from datetime import date
+
+import pytest
+
+
+def test_calendar_links_the_months_either_side(client):
+    page = client.get('/shows/calendar?month=2035-04').get_data(as_text=True)
+    assert 'April 2035' in page and 'month=2035-03' in page and 'month=2035-05' in page
+
+
+@pytest.mark.parametrize('month', ['9999-12', '0001-01', '2035-13', 'april'])
+def test_unusable_month_shows_the_current_one(client, month):
+    response = client.get('/shows/calendar?month={}'.format(month))
+    assert response.status_code == 200
+    assert date.today().strftime('%B %Y') in response.get_data(as_text=True)
+
+
+@pytest.mark.parametrize('month, prev_month, next_month', [('0002-01', '0001-12', '0002-02'),
+                                                           ('9998-12', '9998-11', '9999-01')])
+def test_months_next_to_the_limits(client, month, prev_month, next_month):
+    page = client.get('/shows/calendar?month={}'.format(month)).get_data(as_text=True)
+    assert 'month={}'.format(prev_month) in page and 'month={}'.format(next_month) in page
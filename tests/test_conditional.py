@@ -0,0 +1,32 @@
+from datetime import datetime
+
+import pytest
+
+from app import db, Show
+
+
+def test_listing_is_not_fresh_after_a_delete(client):
+    first = client.get('/shows')
+    assert 'Last-Modified' not in first.headers
+    show_id = db.session.scalar(db.select(db.func.min(Show.id)))
+    assert client.delete('/shows/{}'.format(show_id)).status_code == 200
+    response = client.get('/shows', headers={'If-Modified-Since': 'Fri, 01 Jan 2100 00:00:00 GMT'})
+    assert response.status_code == 200
+
+
+def test_unchanged_listing_is_not_modified(client):
+    first = client.get('/shows')
+    response = client.get('/shows', headers={'If-None-Match': first.headers['ETag']})
+    assert response.status_code == 304
+
+
+@pytest.mark.parametrize('url', ['/api/v1/venues?fields=upcoming_show_count&state=CA',
+                                 '/api/v1/artists?fields=upcoming_show_count'])
+def test_counter_listing_changes_when_any_show_starts(client, clock, url):
+    # Park Square and The Wild Sax Band have shows on April 1, 8 and 15 2035
+    clock.now = datetime(2035, 4, 2)
+    first = client.get(url)
+    clock.now = datetime(2035, 4, 9)
+    response = client.get(url, headers={'If-None-Match': first.headers['ETag']})
+    assert response.status_code == 200
+    assert [r['upcoming_show_count'] for r in response.get_json()['data'] if r['id'] == 3] == [1]
@@ -0,0 +1,45 @@
+from datetime import datetime
+
+from app import db, Venue
+from tests.conftest import reset_caches
+
+
+def make_stale(venue_id):
+    # counters written before the venue's next show started: too high, and a next show in the past
+    db.session.execute(db.update(Venue).where(Venue.id == venue_id)
+                         .values(upcoming_show_count=7, next_show_time=datetime(2000, 1, 1)))
+    db.session.commit()
+    reset_caches()
+
+
+def writes(statements):
+    return [s for s in statements if not s.lstrip().upper().startswith('SELECT')]
+
+
+def test_areas_recount_stale_counters_without_writing(client, statements):
+    make_stale(3)
+    del statements[:]
+    areas = {a['city']: a for a in client.get('/api/v1/areas').get_json()['data']}
+    assert areas['San Francisco']['upcoming_shows'] == 3
+    assert writes(statements) == []
+
+
+def test_venues_listing_does_not_write(client, statements):
+    make_stale(3)
+    del statements[:]
+    assert client.get('/venues').status_code == 200
+    assert writes(statements) == []
+
+
+def test_api_listing_recounts_stale_counters(client):
+    make_stale(3)
+    venues = client.get('/api/v1/venues?fields=upcoming_show_count,next_show_time').get_json()['data']
+    park_square = next(v for v in venues if v['id'] == 3)
+    assert park_square['upcoming_show_count'] == 3
+    assert park_square['next_show_time'] > datetime.now().isoformat()
+
+
+def test_api_detail_has_no_stored_counters(client):
+    venue = client.get('/api/v1/venues/3').get_json()
+    assert 'upcoming_show_count' not in venue and 'next_show_time' not in venue
+    assert venue['upcoming_shows_count'] == len(venue['upcoming_shows'])
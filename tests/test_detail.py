@@ -0,0 +1,44 @@
+import pytest
+
+from tests.conftest import add_synthetic, reset_caches
+from tests.test_venues import get_counting
+
+
+def test_venue_page_statement_count(client, statements):
+    # validators, the venue, then one selectin load of its shows
+    assert get_counting(client, statements, '/venues/3') == 3
+
+
+def test_artist_page_statement_count(client, statements):
+    # validators, the artist, then its shows joined to their venues
+    assert get_counting(client, statements, '/artists/1') == 3
+
+
+def test_detail_statement_count_does_not_grow_with_shows(client, statements):
+    venues, artists = add_synthetic(2, 2, 200)
+    reset_caches()
+    assert get_counting(client, statements, '/venues/{}'.format(venues[0].id)) == 3
+    assert get_counting(client, statements, '/artists/{}'.format(artists[0].id)) == 3
+
+
+def test_api_detail_selects_only_the_requested_fields(client, statements):
+    assert get_counting(client, statements, '/api/v1/venues/3?fields=name') == 3
+    venue_select = next(s for s in statements if 'FROM venues' in s and 'shows' not in s)
+    assert 'venues.address' not in venue_select and 'venues.name' in venue_select
+
+
+def test_api_detail_matches_page_data(client):
+    venue = client.get('/api/v1/venues/3').get_json()
+    assert venue['name'] == 'Park Square Live Music & Coffee'
+    assert venue['upcoming_shows_count'] == 3 and venue['past_shows_count'] == 1
+    assert set(venue['upcoming_shows'][0]) == {'artist_id', 'artist_name', 'artist_image_link', 'start_time'}
+    artist = client.get('/api/v1/artists/1').get_json()
+    assert set(artist['past_shows'][0]) == {'venue_id', 'venue_name', 'venue_image_link', 'start_time'}
+
+
+@pytest.mark.parametrize('url', ['/venues/999', '/artists/999'])
+def test_unknown_id_is_not_found(client, statements, url):
+    assert client.get(url).status_code == 404
+    del statements[:]
+    assert client.get(url).status_code == 404
+    assert statements, 'served a cached 404'
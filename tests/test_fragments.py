@@ -0,0 +1,18 @@
+import os
+
+import pytest
+
+import fragments
+
+
+def test_private_dir_is_created_0700(tmp_path):
+    path = fragments.private_dir(str(tmp_path / 'jinja'))
+    assert os.stat(path).st_mode & 0o777 == 0o700
+
+
+def test_private_dir_refuses_a_shared_directory(tmp_path):
+    shared = tmp_path / 'shared'
+    shared.mkdir()
+    shared.chmod(0o777)
+    with pytest.raises(RuntimeError):
+        fragments.private_dir(str(shared))
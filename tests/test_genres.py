@@ -0,0 +1,25 @@
+import json
+
+
+def api_names(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    return sorted(v['name'] for v in json.loads(response.get_data())['data'])
+
+
+def test_any_genre(client):
+    assert api_names(client, '/api/v1/venues?genre=Folk') == ['Park Square Live Music & Coffee', 'The Musical Hop']
+    assert api_names(client, '/api/v1/venues?genre=Swing&genre=Rock+n+Roll') == [
+        'Park Square Live Music & Coffee', 'The Musical Hop']
+
+
+def test_all_genres(client):
+    assert api_names(client, '/api/v1/venues?genre=Folk&genre=Jazz&match=all') == [
+        'Park Square Live Music & Coffee', 'The Musical Hop']
+    assert api_names(client, '/api/v1/venues?genre=Swing&genre=Rock+n+Roll&match=all') == []
+
+
+def test_genre_filtered_listing_page(client):
+    page = client.get('/venues?genre=Hip-Hop').get_data(as_text=True)
+    assert 'The Dueling Pianos Bar' in page
+    assert 'The Musical Hop' not in page and 'Park Square Live Music' not in page
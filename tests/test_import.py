@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+
+from app import db, Show, complete_show_rows
+
+
+def show_row(venue_id, artist_id, start_time, hours=2):
+    return {'venue_id': venue_id, 'artist_id': artist_id, 'venue_name': None, 'artist_name': None,
+            'artist_image_link': None, 'start_time': start_time, 'end_time': start_time + timedelta(hours=hours)}
+
+
+def test_rows_overlapping_the_stored_schedule_are_rejected(app):
+    # Park Square (venue 3) has The Wild Sax Band from 20:00 to 23:00
+    complete, rejects = complete_show_rows([show_row(3, 1, datetime(2035, 4, 1, 21)),
+                                            show_row(1, 3, datetime(2035, 4, 1, 22, 30)),
+                                            show_row(3, 1, datetime(2035, 4, 1, 23))])
+    assert [r['start_time'].hour for r in complete] == [23]
+    assert [errors['schedule'][0].split(' is already booked')[0] for _, errors in rejects] == \
+        ['Park Square Live Music & Coffee', 'The Wild Sax Band']
+
+
+def test_rows_overlapping_each_other_are_rejected(app):
+    start = datetime(2036, 1, 1, 20)
+    complete, rejects = complete_show_rows([show_row(1, 2, start), show_row(2, 2, start + timedelta(hours=1)),
+                                            show_row(2, 1, start + timedelta(hours=1)),
+                                            show_row(1, 1, start + timedelta(hours=3))])
+    assert [(r['venue_id'], r['artist_id']) for r in complete] == [(1, 2), (2, 1), (1, 1)]
+    assert rejects[0][1]['schedule'] == ['overlaps another show in the file starting {}'.format(start)]
+
+
+def test_chunk_is_checked_in_a_fixed_number_of_statements(app, statements):
+    start = datetime(2036, 1, 1, 12)
+    rows = [show_row(1 + i % 3, 1 + i % 3, start + timedelta(hours=3 * i)) for i in range(200)]
+    complete, rejects = complete_show_rows(rows)
+    assert len(complete) == 200 and rejects == []
+    # venue lookup, artist lookup, stored schedule
+    assert len(statements) == 3
+
+
+def test_exported_shows_import_back(app, client, tmp_path):
+    schedule = lambda: sorted(db.session.query(Show.venue_id, Show.artist_id, Show.start_time, Show.end_time).all())
+    before = schedule()
+    path = tmp_path / 'shows.jsonl'
+    path.write_bytes(client.get('/api/v1/export/shows?format=jsonl').get_data())
+    db.session.execute(db.delete(Show))
+    db.session.commit()
+    result = app.test_cli_runner().invoke(args=['import', 'shows', str(path)])
+    assert result.exit_code == 0, result.output
+    assert '5 loaded, 0 rejected' in result.output
+    db.session.expire_all()
+    assert schedule() == before
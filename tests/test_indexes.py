@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app import db, Venue, Artist, Show, entity_shows_query, show_conflicts, window_filter
+from tests.conftest import add_synthetic
+
+
+def executed_plan(run):
+    # the plan of the last statement run() executes, with its parameters
+    executed = []
+    record = lambda conn, cursor, statement, parameters, context, many: executed.append((statement, parameters))
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        run()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    statement, parameters = executed[-1]
+    rows = db.session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)
+    return ' | '.join(row[-1] for row in rows)
+
+
+def plan(statement):
+    # SQLite's EXPLAIN QUERY PLAN details, e.g. 'SEARCH shows USING INDEX ...'
+    compiled = statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+    return ' | '.join(row[-1] for row in db.session.execute(db.text('EXPLAIN QUERY PLAN {}'.format(compiled))))
+
+
+def test_show_lists_use_the_composite_indexes(app):
+    add_synthetic(20, 20, 500)
+    assert 'ix_shows_venue_id_start_time' in plan(entity_shows_query(Venue, 1))
+    assert 'ix_shows_artist_id_start_time' in plan(entity_shows_query(Artist, 1))
+
+
+def test_show_window_uses_the_start_time_index(app):
+    add_synthetic(20, 20, 500)
+    query = db.select(Show.id).where(window_filter(start=datetime(2030, 1, 1), end=datetime(2030, 2, 1)))\
+              .order_by(Show.start_time)
+    assert 'ix_shows_start_time' in plan(query)
+    query = db.select(Show.id).where(window_filter(start=datetime(2030, 1, 1), venue_id=1))
+    assert 'ix_shows_venue_id_start_time' in plan(query)
+
+
+def test_conflict_check_is_a_range_scan_of_both_composite_indexes(app):
+    add_synthetic(20, 20, 500)
+    start = datetime(2030, 1, 1, 20)
+    detail = executed_plan(lambda: show_conflicts(1, 1, start, start + timedelta(hours=3)))
+    assert 'ix_shows_venue_id_start_time (venue_id=? AND start_time>? AND start_time<?)' in detail
+    assert 'ix_shows_artist_id_start_time (artist_id=? AND start_time>? AND start_time<?)' in detail
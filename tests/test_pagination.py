@@ -0,0 +1,76 @@
+import pytest
+
+from app import db, Show
+from pagination import encode_cursor, keyset_page, page_size
+from tests.conftest import add_synthetic
+
+KEY = (Show.start_time, Show.id)
+
+
+@pytest.fixture
+def show_ids(app):
+    # the 5 seeded shows and 200 more, in (start_time, id) order
+    add_synthetic(4, 4, 200)
+    ids = [id for _, id in db.session.query(*KEY).order_by(*KEY)]
+    assert len(ids) == 205
+    return ids
+
+
+def page_of(**cursor):
+    return keyset_page(db.session.query(*KEY), KEY, limit=50, **cursor)
+
+
+def ids_of(page):
+    return [row.id for row in page.items]
+
+
+def test_walk_forward_and_back(show_ids):
+    pages = [page_of()]
+    assert pages[0].prev_cursor is None
+    while pages[-1].next_cursor:
+        pages.append(page_of(after=pages[-1].next_cursor))
+    assert [len(p.items) for p in pages] == [50, 50, 50, 50, 5]
+    assert sum((ids_of(p) for p in pages), []) == show_ids
+
+    back = [pages[-1]]
+    while back[-1].prev_cursor:
+        back.append(page_of(before=back[-1].prev_cursor))
+    # walking back from the last page lands on the same pages, each in ascending order
+    assert [ids_of(p) for p in back] == [ids_of(p) for p in reversed(pages)]
+    assert back[-1].prev_cursor is None and back[-1].next_cursor == pages[0].next_cursor
+
+
+def test_before_the_second_page_is_the_first(show_ids):
+    second = page_of(after=page_of().next_cursor)
+    first = page_of(before=second.prev_cursor)
+    assert ids_of(first) == show_ids[:50]
+    assert first.prev_cursor is None
+    assert ids_of(page_of(after=first.next_cursor)) == show_ids[50:100]
+
+
+@pytest.mark.parametrize('cursor', ['not a cursor!', 'bm90IGpzb24', encode_cursor(['2035-04-01T20:00:00']),
+                                    encode_cursor(['April 1st', 1]), encode_cursor({'id': 1})])
+@pytest.mark.parametrize('direction', ['after', 'before'])
+def test_malformed_cursor_falls_back_to_the_first_page(show_ids, cursor, direction):
+    page = page_of(**{direction: cursor})
+    assert ids_of(page) == show_ids[:50] and page.prev_cursor is None
+
+
+def test_cursor_past_either_end_falls_back_to_the_first_page(show_ids):
+    last = db.session.query(*KEY).order_by(*KEY).all()[-1]
+    first = db.session.query(*KEY).order_by(*KEY).first()
+    assert ids_of(page_of(after=encode_cursor([last.start_time, last.id]))) == show_ids[:50]
+    assert ids_of(page_of(before=encode_cursor([first.start_time, first.id]))) == show_ids[:50]
+
+
+@pytest.mark.parametrize('requested, size', [(None, 50), ('', 50), ('ten', 50), ('10', 10), ('0', 1),
+                                             ('-5', 1), ('200', 200), ('1000', 200)])
+def test_page_size_is_clamped(requested, size):
+    assert page_size(requested, 50, 200) == size
+
+
+def test_api_limit_is_clamped_to_max_page_size(client, show_ids):
+    page = client.get('/api/v1/shows?limit=1000').get_json()
+    assert [s['id'] for s in page['data']] == show_ids[:200]
+    rest = client.get('/api/v1/shows?limit=1000&after={}'.format(page['next'])).get_json()
+    assert [s['id'] for s in rest['data']] == show_ids[200:] and rest['next'] is None
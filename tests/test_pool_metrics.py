@@ -0,0 +1,83 @@
+import runpy
+
+import pytest
+from sqlalchemy import create_engine, exc, text
+
+import app as fyyur
+import config
+from app import db
+from pool_metrics import PoolMetrics
+
+
+def load_config(monkeypatch, **environ):
+    for name, value in environ.items():
+        monkeypatch.setenv(name, value)
+    return runpy.run_path(config.__file__)
+
+
+def test_pool_config_from_environment(monkeypatch, tmp_path):
+    settings = load_config(monkeypatch, DATABASE_URL='sqlite:///{}'.format(tmp_path / 'fyyur.db'),
+                           DB_POOL_SIZE='2', DB_MAX_OVERFLOW='1', DB_POOL_TIMEOUT='0.5',
+                           DB_POOL_PRE_PING='false', DB_POOL_RECYCLE='60')
+    assert settings['SQLALCHEMY_ENGINE_OPTIONS'] == {'pool_pre_ping': False, 'pool_recycle': 60, 'pool_size': 2,
+                                                     'max_overflow': 1, 'pool_timeout': 0.5}
+
+
+def test_in_memory_database_has_no_queue_to_size(monkeypatch):
+    settings = load_config(monkeypatch, DATABASE_URL='sqlite://', DB_POOL_SIZE='2')
+    assert 'pool_size' not in settings['SQLALCHEMY_ENGINE_OPTIONS']
+
+
+@pytest.fixture
+def engine(monkeypatch, tmp_path):
+    settings = load_config(monkeypatch, DATABASE_URL='sqlite:///{}'.format(tmp_path / 'fyyur.db'),
+                           DB_POOL_SIZE='2', DB_MAX_OVERFLOW='1', DB_POOL_TIMEOUT='0.05')
+    engine = create_engine(settings['SQLALCHEMY_DATABASE_URI'], **settings['SQLALCHEMY_ENGINE_OPTIONS'])
+    yield engine
+    engine.dispose()
+
+
+def test_counters_and_wait_histogram(engine):
+    metrics = PoolMetrics()
+    metrics.install(engine)
+    connections = [engine.connect() for _ in range(3)]
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    stats = metrics.snapshot()
+    assert stats['pool_class'] == 'QueuePool' and stats['size'] == 2
+    assert (stats['connects'], stats['checkouts'], stats['in_use'], stats['in_use_peak']) == (3, 3, 3, 3)
+    assert stats['overflow_checkouts'] == 1 and stats['checkout_timeouts'] == 1
+    waits = stats['checkout_wait_ms']
+    assert waits['count'] == 4 and sum(waits['buckets'].values()) == 4
+    # the timed-out checkout waited out DB_POOL_TIMEOUT
+    assert waits['max'] >= 50
+
+    for connection in connections:
+        connection.close()
+    stats = metrics.snapshot()
+    assert (stats['checkins'], stats['in_use'], stats['idle']) == (3, 0, 2)
+
+
+def test_checkout_timer_survives_dispose(engine):
+    metrics = PoolMetrics()
+    metrics.install(engine)
+    engine.connect().close()
+    engine.dispose()
+    with engine.connect() as connection:
+        connection.execute(text('select 1'))
+        assert metrics.pool is engine.pool
+    stats = metrics.snapshot()
+    assert (stats['connects'], stats['checkouts'], stats['checkins']) == (2, 2, 2)
+    assert stats['checkout_wait_ms']['count'] == 2
+
+
+def test_metrics_endpoint_reports_the_pool(client, file_db, monkeypatch):
+    metrics = PoolMetrics()
+    metrics.install(db.engine)
+    monkeypatch.setattr(fyyur, 'pool_metrics', metrics)
+    assert client.get('/venues/3').status_code == 200
+    db.session.remove()
+    pool = client.get('/metrics').get_json()['pool']
+    assert pool['pool_class'] == 'QueuePool'
+    assert pool['checkouts'] >= 1 and pool['in_use'] == 0 and pool['checkins'] == pool['checkouts']
+    assert sum(pool['checkout_wait_ms']['buckets'].values()) == pool['checkout_wait_ms']['count'] == pool['checkouts']
@@ -0,0 +1,9 @@
+import pytest
+
+
+@pytest.mark.parametrize('enabled', [False, True])
+def test_server_timing_only_when_enabled(client, monkeypatch, enabled):
+    import app as fyyur
+    monkeypatch.setattr(fyyur.query_profiler, 'server_timing', enabled)
+    response = client.get('/shows')
+    assert ('Server-Timing' in response.headers) == enabled
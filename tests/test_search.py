@@ -0,0 +1,14 @@
+from tests.conftest import add_synthetic, reset_caches
+
+
+def test_search_returns_at_most_search_limit(app, client, monkeypatch):
+    add_synthetic(30, 5, 0)
+    reset_caches()
+    monkeypatch.setitem(app.config, 'SEARCH_LIMIT', 5)
+    found = client.get('/api/v1/venues/search?q=').get_json()
+    assert found['count'] == 5 and len(found['data']) == 5
+
+
+def test_search_finds_partial_names(client):
+    found = client.get('/api/v1/venues/search?q=Music').get_json()
+    assert {v['name'] for v in found['data']} == {'The Musical Hop', 'Park Square Live Music & Coffee'}
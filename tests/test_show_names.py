@@ -0,0 +1,34 @@
+from app import db, Artist, Show
+
+
+def copies(artist_id):
+    return set(db.session.query(Show.artist_name, Show.artist_image_link).filter(Show.artist_id == artist_id))
+
+
+def test_artist_edit_updates_the_copies_on_its_shows(client):
+    client.post('/artists/3/edit', data={'name': 'Sax Machine', 'image_link': 'https://example.com/sax.png'})
+    assert copies(3) == {('Sax Machine', 'https://example.com/sax.png')}
+    assert 'Sax Machine' in client.get('/shows').get_data(as_text=True)
+
+
+def test_venue_edit_updates_the_copies_on_its_shows(client):
+    client.post('/venues/3/edit', data={'name': 'Park Square'})
+    names = {name for name, in db.session.query(Show.venue_name).filter(Show.venue_id == 3)}
+    assert names == {'Park Square'}
+
+
+def test_show_listings_read_only_shows(client, statements):
+    for url in ('/shows', '/api/v1/shows?fields=venue_name,artist_name,artist_image_link'):
+        del statements[:]
+        assert client.get(url).status_code == 200
+        listing = [s for s in statements if 'shows.start_time' in s and 'count(' not in s]
+        assert listing and all('JOIN' not in s and 'venues' not in s and 'artists' not in s for s in listing)
+
+
+def test_sync_show_names_repairs_drifted_copies(app):
+    db.session.execute(db.update(Show).where(Show.artist_id == 3).values(artist_name='stale'))
+    db.session.commit()
+    result = app.test_cli_runner().invoke(args=['sync-show-names'])
+    assert 'shows: 3 drifted row update(s) repaired' in result.output
+    artist = db.session.get(Artist, 3)
+    assert copies(3) == {(artist.name, artist.image_link)}
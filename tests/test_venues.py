@@ -0,0 +1,26 @@
+from tests.conftest import add_synthetic, reset_caches
+
+
+def get_counting(client, statements, url):
+    del statements[:]
+    response = client.get(url)
+    assert response.status_code == 200
+    return len(statements)
+
+
+def test_venues_listing_statement_count(client, statements):
+    # validators, the grouped listing page and genre facets
+    assert get_counting(client, statements, '/venues') == 3
+
+
+def test_venues_listing_statement_count_does_not_grow_with_data(client, statements):
+    before = get_counting(client, statements, '/venues')
+    add_synthetic(venues=60, artists=40, shows=300)
+    reset_caches()
+    assert get_counting(client, statements, '/venues') == before
+
+
+def test_venues_listing_groups_by_area(client):
+    page = client.get('/venues').get_data(as_text=True)
+    assert 'San Francisco' in page and 'New York' in page
+    assert 'The Musical Hop' in page and 'The Dueling Pianos Bar' in page